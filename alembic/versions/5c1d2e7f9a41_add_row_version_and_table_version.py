@@ -0,0 +1,37 @@
+"""Add row version and table change counter
+
+Revision ID: 5c1d2e7f9a41
+Revises: bb079aaf9903
+Create Date: 2026-10-18 09:12:40.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1d2e7f9a41'
+down_revision: Union[str, None] = 'bb079aaf9903'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('geolocation', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('geolocation', sa.Column('updated_at', sa.DateTime(timezone=True),
+                                           server_default=sa.text('now()'), nullable=False))
+    op.create_table('table_version',
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute("INSERT INTO table_version (table_name, version) VALUES ('geolocation', 0)")
+
+
+def downgrade() -> None:
+    op.drop_table('table_version')
+    op.drop_column('geolocation', 'updated_at')
+    op.drop_column('geolocation', 'version')
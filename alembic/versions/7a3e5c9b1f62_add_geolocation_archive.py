@@ -0,0 +1,44 @@
+"""Add geolocation archive and change log expiry index
+
+Revision ID: 7a3e5c9b1f62
+Revises: d2f6a8b41c07
+Create Date: 2026-10-18 18:26:44.817302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3e5c9b1f62'
+down_revision: Union[str, None] = 'd2f6a8b41c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('geolocation_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('ip_or_url', sa.String(), nullable=False),
+    sa.Column('country', sa.String(), nullable=True),
+    sa.Column('region', sa.String(), nullable=True),
+    sa.Column('city', sa.String(), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_geolocation_archive_ip_or_url'), 'geolocation_archive', ['ip_or_url'], unique=False)
+    op.create_index(op.f('ix_geolocation_updated_at'), 'geolocation', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_geolocation_change_created_at'), 'geolocation_change', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_geolocation_change_created_at'), table_name='geolocation_change')
+    op.drop_index(op.f('ix_geolocation_updated_at'), table_name='geolocation')
+    op.drop_index(op.f('ix_geolocation_archive_ip_or_url'), table_name='geolocation_archive')
+    op.drop_table('geolocation_archive')
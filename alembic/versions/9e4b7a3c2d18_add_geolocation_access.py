@@ -0,0 +1,33 @@
+"""Add geolocation access counter
+
+Revision ID: 9e4b7a3c2d18
+Revises: 5c1d2e7f9a41
+Create Date: 2026-10-18 14:03:27.540981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b7a3c2d18'
+down_revision: Union[str, None] = '5c1d2e7f9a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('geolocation_access',
+    sa.Column('ip_or_url', sa.String(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('last_accessed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('ip_or_url')
+    )
+    op.create_index(op.f('ix_geolocation_access_hits'), 'geolocation_access', ['hits'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_geolocation_access_hits'), table_name='geolocation_access')
+    op.drop_table('geolocation_access')
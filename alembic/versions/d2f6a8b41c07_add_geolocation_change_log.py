@@ -0,0 +1,33 @@
+"""Add geolocation change log
+
+Revision ID: d2f6a8b41c07
+Revises: 9e4b7a3c2d18
+Create Date: 2026-10-18 17:41:09.203456
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6a8b41c07'
+down_revision: Union[str, None] = '9e4b7a3c2d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('geolocation_change',
+    sa.Column('seq', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('operation', sa.String(), nullable=False),
+    sa.Column('geolocation_id', sa.Integer(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('geolocation_change')
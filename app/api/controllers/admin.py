@@ -0,0 +1,52 @@
+import asyncio
+import secrets
+import threading
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.profiling import SamplingProfiler, slow_requests
+
+_profile_lock = asyncio.Lock()
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    """Allows the request only with the configured admin token. Without one, admin endpoints don't exist."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile", response_class=PlainTextResponse,
+             summary="Profile the worker",
+             description="Samples this worker's event loop thread for `seconds` and returns the stacks in folded "
+                         "format, ready for flamegraph.pl or speedscope. Requires the `X-Admin-Token` header."
+             )
+async def profile(seconds: float = Query(10, gt=0)):
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Profile at most {settings.PROFILER_MAX_SECONDS} seconds")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with _profile_lock:
+        profiler = SamplingProfiler(threading.get_ident(), interval=settings.PROFILER_INTERVAL_MS / 1000)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    return profiler.folded()
+
+
+@router.get("/slow-requests",
+            summary="List slow requests",
+            description="Returns the most recent requests slower than `SLOW_REQUEST_THRESHOLD_MS`, newest first, "
+                        "with time spent per stage. Requires the `X-Admin-Token` header."
+            )
+async def get_slow_requests(limit: int | None = Query(None, gt=0)):
+    return slow_requests.recent(limit)
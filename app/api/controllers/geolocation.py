@@ -1,6 +1,9 @@
-from typing import List, Union
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Union
 
-from fastapi import Depends, HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -8,14 +11,28 @@ from app.crud.geolocation import (
     get_geolocation_by_ip_or_url,
     create_geolocation,
     delete_geolocation as delete_geolocation_db,
+    delete_geolocations as delete_geolocations_db,
     get_all_geolocations,
     get_geolocation_by_id,
+    get_table_version,
+    stream_geolocations,
 )
+from app.api.routing import TimedRoute
+from app.core.config import settings
+from app.api.http_cache import make_etag, cache_headers, is_not_modified, not_modified
+from app.api.negotiation import JSON, MSGPACK, NDJSON, REPRESENTATIONS, available, msgpack_response, negotiate
 from app.schemas.geolocation import GeoLocationResponse, GeoRequest
 from app.db import database
+from app.services.change_feed import change_feed
+from app.services.cache import cache_geolocation, get_cached_geolocation, evict_geolocation, cached_last_modified
 from app.services.geolocation import get_geolocation
+from app.services.hot_keys import access_tracker
+from app.services.write_behind import write_behind_buffer
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Sequence of the latest change included in a full listing, where a change feed subscription can resume
+CHANGE_SEQ_HEADER = "X-Change-Seq"
 
 
 @router.post("/geolocation", response_model=GeoLocationResponse,
@@ -25,42 +42,126 @@ router = APIRouter()
              )
 async def add_geolocation(request: GeoRequest, db: AsyncSession = Depends(database.get_db)):
     try:
-        existing_entry = await get_geolocation_by_ip_or_url(db, ip_or_url=request.ip_or_url)
+        existing_entry = (write_behind_buffer.get(request.ip_or_url)
+                          or await get_geolocation_by_ip_or_url(db, ip_or_url=request.ip_or_url))
         if existing_entry:
             raise HTTPException(status_code=409, detail="Geolocation record already exists")
         data = await get_geolocation(request)
         if not data:
             raise HTTPException(status_code=400, detail="Invalid IP address or URL")
+        if write_behind_buffer.enabled:
+            return await write_behind_buffer.add(data)
         return await create_geolocation(db, data)
     except SQLAlchemyError:
         raise HTTPException(status_code=503, detail="Database service is unavailable")
 
+async def server_sent_events(changes: AsyncIterator) -> AsyncIterator[str]:
+    """Formats change feed events as Server-Sent Events; idle periods become comments that keep the connection open."""
+    async for change in changes:
+        if change is None:
+            yield ": keepalive\n\n"
+        elif change["seq"] is None:  # Not a change, so there is no sequence to resume from
+            yield f"event: {change['operation']}\ndata: {json.dumps(change['data'])}\n\n"
+        else:
+            yield f"id: {change['seq']}\nevent: {change['operation']}\ndata: {json.dumps(change['data'])}\n\n"
+
+
+@router.get("/geolocation/changes",
+            summary="Stream geolocation changes",
+            description="Streams created and deleted geolocations as Server-Sent Events, starting after "
+                        "sequence `since` (default: now). Each event's `id` is its sequence; reconnecting "
+                        "clients resume after the `Last-Event-ID` header. A full listing's `X-Change-Seq` "
+                        "header is where a subscription picks up from it. If changes after `since` were "
+                        "already pruned from the change log, returns HTTP 410 Gone (or, mid-stream, a `reset` "
+                        "event): reload the full list and subscribe from its `X-Change-Seq`."
+            )
+async def stream_geolocation_changes(request: Request, since: int | None = None):
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    try:
+        if since is None:
+            since = await change_feed.current_seq()
+        elif since < await change_feed.oldest_since():
+            raise HTTPException(status_code=410, detail="Changes after this sequence were pruned from the change log; "
+                                                        "reload the full list and subscribe from its X-Change-Seq")
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="Database service is unavailable")
+    changes = change_feed.changes(since, keepalive=settings.CHANGE_FEED_KEEPALIVE_SECONDS)
+    return StreamingResponse(server_sent_events(changes), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def ndjson_lines(session_factory) -> AsyncIterator[str]:
+    """Streams all geolocations as newline-delimited JSON, one batch of rows per chunk."""
+    async with session_factory() as db:
+        async for batch in stream_geolocations(db):
+            yield "".join(json.dumps(row) + "\n" for row in batch)
+
+
 @router.get("/geolocation", response_model=Union[List[GeoLocationResponse], GeoLocationResponse],
             summary="Retrieve geolocation data",
             description="Fetches stored geolocation data from the database. "
                         "Can be filtered by `id` or `ip_or_url`. "
-                        "If no parameters are provided, all records are returned."
+                        "If no parameters are provided, all records are returned. "
+                        "Responses carry `ETag`/`Last-Modified` validators; a matching `If-None-Match` "
+                        "returns HTTP 304 Not Modified. "
+                        "`Accept: application/x-ndjson` streams the full list as newline-delimited JSON, and "
+                        "`Accept: application/msgpack` returns MessagePack when the msgpack package is installed."
             )
 async def get_geolocation_data(
+        request: Request,
+        response: Response,
         id: int | None = None,
         ip_or_url: str | None = None,
-        db: AsyncSession = Depends(database.get_db),
+        db: AsyncSession = Depends(database.get_read_db),
+        session_factory=Depends(database.get_read_session_factory),
 ):
     try:
         if id and ip_or_url:
             raise HTTPException(status_code=400, detail="Provide either id or ip_or_url, not both.")
 
-        if id:
-            data = await get_geolocation_by_id(db, id)
-        elif ip_or_url:
-            data = await get_geolocation_by_ip_or_url(db, ip_or_url)
-        else:
+        if not id and not ip_or_url:
+            # Validate against the table change counter before loading any rows
+            table_version = await get_table_version(db)
+            version = table_version.version if table_version else 0
+            last_modified = table_version.updated_at if table_version else None
+            media_type = negotiate(request, available(JSON, NDJSON, MSGPACK))
+            headers = cache_headers(make_etag("all", version, REPRESENTATIONS[media_type]), last_modified)
+            headers[CHANGE_SEQ_HEADER] = str(version)
+            if is_not_modified(request, headers["ETag"], last_modified):
+                return not_modified(headers)
+            if media_type == NDJSON:
+                # Read after the handler returns, so it can't use the dependency's session
+                return StreamingResponse(ndjson_lines(session_factory), media_type=NDJSON, headers=headers)
+            if media_type == MSGPACK:
+                return msgpack_response([row async for batch in stream_geolocations(db) for row in batch], headers)
+            response.headers.update(headers)
             return await get_all_geolocations(db)
 
-        if not data:
-            raise HTTPException(status_code=404, detail="Data not found")
+        # Rows still waiting in the write-behind buffer are served from memory
+        buffered = write_behind_buffer.get_by_id(id) if id else write_behind_buffer.get(ip_or_url)
+        cached = buffered or get_cached_geolocation(id=id, ip_or_url=ip_or_url)
+        if not cached:
+            if id:
+                entry = await get_geolocation_by_id(db, id)
+            else:
+                entry = await get_geolocation_by_ip_or_url(db, ip_or_url)
+
+            if not entry:
+                raise HTTPException(status_code=404, detail="Data not found")
+            cached = cache_geolocation(entry)
 
-        return data
+        access_tracker.record(cached["ip_or_url"])
+        modified = cached_last_modified(cached)
+        media_type = negotiate(request, available(JSON, MSGPACK))
+        headers = cache_headers(make_etag(cached["id"], cached["version"], REPRESENTATIONS[media_type]), modified)
+        if is_not_modified(request, headers["ETag"], modified):
+            return not_modified(headers)
+        if media_type == MSGPACK:
+            return msgpack_response(GeoLocationResponse(**cached).model_dump(), headers)
+        response.headers.update(headers)
+        return GeoLocationResponse(**cached)
 
     except SQLAlchemyError:
         raise HTTPException(status_code=503, detail="Database service is unavailable")
@@ -73,10 +174,46 @@ async def get_geolocation_data(
                )
 async def delete_geolocation(db: AsyncSession = Depends(database.get_db), id: int = None):
     try:
+        if write_behind_buffer.get_by_id(id):
+            await write_behind_buffer.flush()
         deleted = await delete_geolocation_db(db=db, id=id)
-        if not deleted:
-            raise HTTPException(status_code=404, detail="Data not found")
+        evict_geolocation(deleted["id"], deleted["ip_or_url"])
         return {"message": "Successfully deleted"}
 
     except SQLAlchemyError:
         raise HTTPException(status_code=503, detail="Database service is unavailable")
+
+
+@router.delete("/geolocation",
+               summary="Delete geolocations in bulk",
+               description="Deletes all geolocations matching every given condition: a list of `id`s, an ID range "
+                           "(`min_id`/`max_id`, inclusive), `country` and `updated_before`, in batches of one "
+                           "transaction each. At least one condition is required. Returns the number of deleted "
+                           "records and, unless there are more than `BULK_DELETE_MAX_IDS`, their IDs."
+               )
+async def delete_geolocations(
+        db: AsyncSession = Depends(database.get_db),
+        id: List[int] | None = Query(None),
+        min_id: int | None = None,
+        max_id: int | None = None,
+        country: str | None = None,
+        updated_before: datetime | None = None,
+):
+    try:
+        if len(write_behind_buffer):
+            await write_behind_buffer.flush()
+        count, ids = 0, []
+        async for deleted in delete_geolocations_db(db, ids=id, min_id=min_id, max_id=max_id, country=country,
+                                                    updated_before=updated_before,
+                                                    batch_size=settings.BULK_DELETE_BATCH_SIZE):
+            for row in deleted:
+                evict_geolocation(row["id"], row["ip_or_url"])
+            count += len(deleted)
+            if count <= settings.BULK_DELETE_MAX_IDS:
+                ids.extend(row["id"] for row in deleted)
+        if count > settings.BULK_DELETE_MAX_IDS:
+            return {"deleted": count}
+        return {"deleted": count, "ids": ids}
+
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="Database service is unavailable")
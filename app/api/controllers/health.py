@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+
+@router.get("/health/live",
+            summary="Liveness probe",
+            description="Returns HTTP 200 while the process is running."
+            )
+async def live():
+    return {"status": "ok"}
+
+
+@router.get("/health/ready",
+            summary="Readiness probe",
+            description="Returns HTTP 200 once startup warmup has finished, HTTP 503 before that and during shutdown."
+            )
+async def ready(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
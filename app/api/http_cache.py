@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+def make_etag(*parts) -> str:
+    """Builds a strong ETag from the given parts, skipping None, e.g. make_etag(4, 2) -> '"4-2"'."""
+    return '"' + "-".join(str(part) for part in parts if part is not None) + '"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treats naive datetimes (as returned by SQLite) as UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """Returns the validator and Cache-Control headers for a cacheable GET response."""
+    max_age = settings.HTTP_CACHE_MAX_AGE
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache",
+        "Vary": "Accept",  # The body's format is negotiated
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluates the request's conditional headers against the current validators.
+    If-None-Match takes precedence over If-Modified-Since, as required by RFC 9110.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # GET uses weak comparison, so W/"x" matches "x"
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Returns an empty 304 response carrying the current validators."""
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,176 @@
+import time
+from uuid import uuid4
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.compression import choose_encoding, create_compressor
+from app.core.config import settings
+from app.core.logger import request_id_var
+from app.core.profiling import RequestTimings, request_timings, slow_requests, timed_stage
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Media types worth compressing, besides text/* (event streams excepted)
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/msgpack"}
+
+
+class RequestIdMiddleware:
+    """
+    Assigns each HTTP request an ID, taken from the X-Request-ID header or generated, makes it
+    available to log records and returns it in the response's X-Request-ID header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next((value.decode("latin-1") for name, value in scope["headers"]
+                           if name == b"x-request-id"), None) or uuid4().hex
+        request_id = request_id[:128]
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+class TimingMiddleware:
+    """
+    Times each HTTP request and collects its per-stage breakdown. Requests slower than
+    SLOW_REQUEST_THRESHOLD_MS are added to the slow request log, except event streams.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        status = 500
+        streaming = False
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = MutableHeaders(scope=message).get("content-type", "").startswith("text/event-stream")
+            await send(message)
+
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            request_timings.reset(token)
+            # Event streams stay open for as long as the client listens, so their duration says nothing
+            if duration * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS and not streaming:
+                slow_requests.add(scope["method"], scope["path"], status, duration, request_id_var.get(), timings)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best encoding the client accepts from Accept-Encoding.
+    Responses smaller than `minimum_size` are sent as they are. Streamed responses are compressed
+    chunk by chunk, and each chunk is flushed so clients can decode rows as soon as they arrive.
+    """
+
+    def __init__(self, app: ASGIApp, encodings=("gzip",), minimum_size: int = 1024, levels=None):
+        self.app = app
+        self.encodings = list(encodings)
+        self.minimum_size = minimum_size
+        self.levels = levels or {}
+
+    @staticmethod
+    def compressible(message: Message) -> bool:
+        headers = MutableHeaders(scope=message)
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if message["status"] in (204, 304) or "content-encoding" in headers or content_type == "text/event-stream":
+            return False
+        return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+    @staticmethod
+    def weaken_etag(headers: MutableHeaders) -> None:
+        """Compressed bytes differ from the identity representation a strong ETag names, so it becomes weak."""
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            headers["ETag"] = "W/" + headers["etag"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = next((value.decode("latin-1") for name, value in scope["headers"]
+                                if name == b"accept-encoding"), "")
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        start_message = None  # Held back until the first body chunk shows whether to compress
+        compressor = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                # With an encoding negotiated, the ETag is weak whether or not the body ends up compressed,
+                # so that a 304 (whose body size is unknown) repeats the validators of the 200 it revalidates
+                if message["status"] == 304:
+                    headers = MutableHeaders(scope=message)
+                    headers.add_vary_header("Accept-Encoding")
+                    if encoding is not None:
+                        self.weaken_etag(headers)
+                elif self.compressible(message):
+                    headers = MutableHeaders(scope=message)
+                    headers.add_vary_header("Accept-Encoding")
+                    if encoding is not None:
+                        self.weaken_etag(headers)
+                        start_message = message
+                        return
+                await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = create_compressor(encoding, self.levels.get(encoding))
+                headers = MutableHeaders(scope=start)
+                headers["Content-Encoding"] = encoding
+                with timed_stage("compress"):
+                    if more_body:
+                        del headers["Content-Length"]
+                        body = compressor.compress(body, flush=True)
+                    else:
+                        body = compressor.compress(body) + compressor.finish()
+                        headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if compressor is None:
+                await send(message)
+                return
+            with timed_stage("compress"):
+                body = compressor.compress(body, flush=True) if more_body else compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,52 @@
+from typing import Any, Dict, Sequence
+
+from fastapi import Request, Response
+
+try:
+    import msgpack
+except ImportError:  # Optional: MessagePack is only offered when installed
+    msgpack = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+
+
+# ETag part distinguishing each representation from the JSON one
+REPRESENTATIONS = {JSON: None, NDJSON: "ndjson", MSGPACK: "msgpack"}
+
+
+def available(*media_types: str) -> list:
+    """Filters out media types whose encoder is not installed."""
+    return [media_type for media_type in media_types if media_type != MSGPACK or msgpack is not None]
+
+
+def negotiate(request: Request, offers: Sequence[str]) -> str:
+    """
+    Returns the offered media type the client prefers according to its Accept header, breaking ties by
+    the order of `offers`. Falls back to the first offer when the client accepts none of them.
+    """
+    accepted: Dict[str, float] = {}
+    for part in request.headers.get("accept", "").split(","):
+        media_type, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type.strip():
+            accepted[media_type.strip().lower()] = q
+
+    best, best_q = offers[0], 0.0
+    for offer in offers:
+        q = accepted.get(offer, accepted.get(offer.split("/")[0] + "/*", accepted.get("*/*", 0.0)))
+        if q > best_q:
+            best, best_q = offer, q
+    return best
+
+
+def msgpack_response(content: Any, headers: Dict[str, str] = None) -> Response:
+    return Response(msgpack.packb(content), media_type=MSGPACK, headers=headers)
@@ -0,0 +1,44 @@
+import functools
+import time
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from app.core.profiling import request_timings
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that splits request handling into the "validate" stage (parsing and validating the request
+    and resolving dependencies, before the endpoint runs) and the "serialize" stage (building the
+    response after the endpoint returns), on top of the stages timed inside the endpoint.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kwargs):
+            timings = request_timings.get()
+            if timings is not None:
+                timings.endpoint_started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+
+        super().__init__(path, timed_endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def timed_route_handler(request: Request) -> Response:
+            started = time.perf_counter()
+            response = await route_handler(request)
+            timings = request_timings.get()
+            if timings is not None and timings.endpoint_finished is not None:
+                timings.add("validate", timings.endpoint_started - started)
+                timings.add("serialize", time.perf_counter() - timings.endpoint_finished)
+            return response
+
+        return timed_route_handler
@@ -1,10 +1,29 @@
 import httpx
 from typing import Dict, Any, Optional
 
+from app.core.cache import NegativeCache
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.profiling import timed
 from app.utils import resolve_url_to_ip
 
+# Failed lookups by input (domain or IP), shared by the DNS and IPStack steps of a lookup
+negative_cache = NegativeCache(settings.NEGATIVE_CACHE_TTLS, max_entries=settings.NEGATIVE_CACHE_MAX_ENTRIES)
+
+# A rate limit or an unusable account blocks every lookup, so it is remembered under this key rather than per IP
+RATE_LIMIT_KEY = "*"
+
+# IPStack error codes with their own error class; any other code is "upstream"
+IPSTACK_ERROR_CLASSES = {
+    101: "account",  # Missing or invalid access key
+    102: "account",  # Inactive account
+    104: "rate_limit",
+    106: "invalid_ip",
+}
+
+# Error classes that fail every lookup, not just the one for the IP at hand
+GLOBAL_ERROR_CLASSES = {"account", "rate_limit"}
+
 
 class IPStackClient:
     """Handles communication with the IPStack API."""
@@ -17,19 +36,35 @@ class IPStackClient:
         """
         ip_address = resolve_url_to_ip(ip_or_url)
         if not ip_address:
-            logger.warning(f"Invalid IP or URL provided: {ip_or_url}")
+            logger.warning("Invalid IP or URL provided: %s", ip_or_url)
             return None
-        logger.info(f"Resolved '{ip_or_url}' to IP: {ip_address}")
+        logger.info("Resolved '%s' to IP: %s", ip_or_url, ip_address)
         return ip_address
 
     @staticmethod
+    def failure(ip: str) -> Optional[str]:
+        """Returns the error class of a recent failed lookup for this IP, or None."""
+        return negative_cache.get(RATE_LIMIT_KEY) or negative_cache.get(ip)
+
+    @staticmethod
+    def remember_failure(ip: str, error_class: str) -> None:
+        negative_cache.add(RATE_LIMIT_KEY if error_class in GLOBAL_ERROR_CLASSES else ip, error_class)
+
+    @staticmethod
+    @timed("upstream")
     async def fetch_geolocation(ip: str) -> Dict[str, Any]:
         """
         Fetches geolocation data for a given IP address from the IPStack API.
         Returns a dictionary containing geolocation details or an empty dictionary in case of an error.
+        Failures are remembered for a short time, during which the API is not called again.
         """
+        error_class = IPStackClient.failure(ip)
+        if error_class:
+            logger.info("Skipping IPStack request for %s after a recent '%s' failure", ip, error_class)
+            return {}
+
         url = f"{settings.BASE_URL}/{ip}?access_key={settings.IPSTACK_API_KEY}"
-        logger.info(f"Requesting geolocation data for IP: {ip}")
+        logger.info("Requesting geolocation data for IP: %s", ip, extra={"ip": ip})
 
         try:
             async with httpx.AsyncClient(timeout=5) as client:
@@ -38,18 +73,22 @@ class IPStackClient:
                 data = response.json()
 
                 if "error" in data:
-                    logger.error(f"API error {data['error']['code']}: {data['error']['info']}")
+                    logger.error("API error %s: %s", data['error']['code'], data['error']['info'],
+                                 extra={"ip": ip, "error_code": data['error']['code']})
+                    IPStackClient.remember_failure(ip, IPSTACK_ERROR_CLASSES.get(data["error"]["code"], "upstream"))
                     return {}
 
-                logger.info(f"Geolocation data retrieved successfully for {ip}")
+                logger.info("Geolocation data retrieved successfully for %s", ip)
                 return data
 
         except httpx.HTTPStatusError as e:
-            logger.error(f"API request failed with status {e.response.status_code}: {e.response.text}")
+            logger.error("API request failed with status %s: %s", e.response.status_code, e.response.text)
+            IPStackClient.remember_failure(ip, "rate_limit" if e.response.status_code == 429 else "upstream")
             return {}
 
         except httpx.RequestError as e:
-            logger.error(f"Network error while connecting to IPStack: {e}")
+            logger.error("Network error while connecting to IPStack: %s", e)
+            IPStackClient.remember_failure(ip, "upstream")
             return {}
 
     @staticmethod
@@ -58,7 +97,7 @@ class IPStackClient:
         Resolves an IP or URL and retrieves its geolocation data.
         Returns geolocation information as a dictionary or an empty dictionary if the input is invalid.
         """
-        logger.info(f"Processing geolocation request for: {ip_or_url}")
+        logger.info("Processing geolocation request for: %s", ip_or_url)
 
         ip_address = IPStackClient.resolve_ip(ip_or_url)
         if not ip_address:
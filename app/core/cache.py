@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional
+
+from app.core.logger import logger
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry expiry.
+    Evicts the least recently used entry when `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Stores a value for `ttl` seconds (the cache default if not given)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self, unlink: bool = False) -> None:
+        """Nothing to release for an in-process cache."""
+
+
+class NegativeCache:
+    """
+    Remembers failed lookups, so repeated requests for the same bad input fail fast.
+    Each failure is stored with its error class, and each class has its own TTL.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 10000):
+        self.ttls = ttls
+        self._cache = TTLCache(max_entries=max_entries, ttl=0)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the error class of a remembered failure, or None."""
+        return self._cache.get(key)
+
+    def add(self, key: str, error_class: str) -> None:
+        """Remembers a failure; classes without a positive TTL are not remembered."""
+        ttl = self.ttls.get(error_class, 0)
+        if ttl > 0:
+            self._cache.set(key, error_class, ttl=ttl)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SharedMemoryCache:
+    """
+    Cache shared by all worker processes on one host, stored in a named shared memory segment.
+
+    The segment is a fixed-size hash table: each key hashes to a window of `PROBE` consecutive slots
+    of `slot_size` bytes, so entries (key and JSON value) larger than a slot are not cached.
+    Every slot starts with a sequence number (a seqlock): writers make it odd while they write,
+    and readers retry if it was odd or changed while they copied the slot, so reads take no locks.
+    Writers lock the byte range of their probe window in a lock file, so writes to overlapping
+    windows are serialized across processes.
+    """
+
+    MAGIC = b"GEOC"
+    PROBE = 4
+    READ_RETRIES = 8
+    _HEADER = struct.Struct("<4sII")  # Magic, slot count, slot size
+    _SLOT = struct.Struct("<IQdI")  # Sequence, key hash (0 = empty), expiry (epoch seconds), payload length
+    _SEQ = struct.Struct("<I")
+    _SLOT_BODY = struct.Struct("<QdI")  # The slot header after the sequence
+
+    def __init__(self, name: str, slots: int = 65536, slot_size: int = 512, ttl: float = 300):
+        import fcntl  # POSIX only; the in-process cache is the portable default
+
+        self._fcntl = fcntl
+        if slots < self.PROBE or slot_size <= self._SLOT.size:
+            raise ValueError("Shared cache needs at least 4 slots larger than the slot header")
+        self.name = name
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self._shm = self._open_segment(name, self._HEADER.size + slots * slot_size)
+        self._buf = self._shm.buf
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{name}.lock"), "a+b")
+        self._thread_lock = threading.Lock()  # Record locks don't exclude threads of the same process
+
+    def _open_segment(self, name: str, size: int) -> shared_memory.SharedMemory:
+        """Creates the segment, or attaches to the one another worker created with the same layout."""
+        kwargs = {"track": False} if sys.version_info >= (3, 13) else {}
+        header = self._HEADER.pack(self.MAGIC, self.slots, self.slot_size)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size, **kwargs)
+            shm.buf[:len(header)] = header
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name, **kwargs)
+            if shm.size < size or bytes(shm.buf[:len(header)]) != header:
+                # Left over from a run with a different layout
+                shm.close()
+                shared_memory.SharedMemory(name=name, **kwargs).unlink()
+                return self._open_segment(name, size)
+        if not kwargs:
+            # Before Python 3.13 every attached process registers the segment with its resource
+            # tracker, which unlinks it when that process exits; the owner unlinks it via close()
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Must be stable across processes, so the builtin (randomized) hash() won't do
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _window(self, key_hash: int) -> range:
+        first = key_hash % (self.slots - self.PROBE + 1)
+        return range(first, first + self.PROBE)
+
+    def _offset(self, slot: int) -> int:
+        return self._HEADER.size + slot * self.slot_size
+
+    def _read_slot(self, slot: int) -> Optional[tuple]:
+        """Returns a consistent (key hash, expiry, payload) snapshot of a slot, or None if it is being written."""
+        offset = self._offset(slot)
+        for _ in range(self.READ_RETRIES):
+            seq, key_hash, expires_at, length = self._SLOT.unpack_from(self._buf, offset)
+            if seq & 1:
+                continue
+            start = offset + self._SLOT.size
+            payload = bytes(self._buf[start:start + min(length, self.slot_size - self._SLOT.size)])
+            if self._SLOT.unpack_from(self._buf, offset)[0] == seq:
+                return key_hash, expires_at, payload
+        return None
+
+    def _write_slot(self, slot: int, key_hash: int, expires_at: float, payload: bytes) -> None:
+        """Writes a slot; the caller must hold the lock of its window."""
+        offset = self._offset(slot)
+        seq = self._SEQ.unpack_from(self._buf, offset)[0]
+        self._SEQ.pack_into(self._buf, offset, seq + 1)  # Odd: readers retry
+        start = offset + self._SLOT.size
+        self._buf[start:start + len(payload)] = payload
+        self._SLOT_BODY.pack_into(self._buf, offset + self._SEQ.size, key_hash, expires_at, len(payload))
+        # Publishing the even sequence must be the last store, so readers never see it with a stale header
+        self._SEQ.pack_into(self._buf, offset, (seq + 2) & 0xFFFFFFFF)
+
+    @contextmanager
+    def _locked(self, window: range):
+        with self._thread_lock:
+            self._fcntl.lockf(self._lock_file, self._fcntl.LOCK_EX, len(window), window.start)
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(self._lock_file, self._fcntl.LOCK_UN, len(window), window.start)
+
+    def __len__(self) -> int:
+        now = time.time()
+        count = 0
+        for slot in range(self.slots):
+            _, key_hash, expires_at, _ = self._SLOT.unpack_from(self._buf, self._offset(slot))
+            if key_hash and expires_at > now:
+                count += 1
+        return count
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value, or None if it is missing, expired or being written."""
+        key_hash = self._hash(key)
+        for slot in self._window(key_hash):
+            snapshot = self._read_slot(slot)
+            if snapshot is None or snapshot[0] != key_hash:
+                continue
+            _, expires_at, payload = snapshot
+            if expires_at <= time.time():
+                return None
+            try:
+                stored_key, value = json.loads(payload)
+            except (TypeError, ValueError):
+                continue  # A torn or corrupt slot is a miss, not an error
+            if stored_key == key:  # Guards against 64-bit hash collisions
+                return value
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Stores a JSON-serializable value for `ttl` seconds, replacing the entry expiring soonest if needed."""
+        payload = json.dumps([key, value], separators=(",", ":")).encode()
+        if len(payload) > self.slot_size - self._SLOT.size:
+            return
+        key_hash = self._hash(key)
+        window = self._window(key_hash)
+        now = time.time()
+        with self._locked(window):
+            headers = {slot: self._SLOT.unpack_from(self._buf, self._offset(slot)) for slot in window}
+            target = next((slot for slot, header in headers.items() if header[1] == key_hash), None)
+            if target is None:
+                target = next((slot for slot, header in headers.items() if not header[1] or header[2] <= now), None)
+            if target is None:
+                target = min(headers, key=lambda slot: headers[slot][2])
+            self._write_slot(target, key_hash, now + (self.ttl if ttl is None else ttl), payload)
+
+    def delete(self, key: str) -> None:
+        key_hash = self._hash(key)
+        window = self._window(key_hash)
+        with self._locked(window):
+            for slot in window:
+                if self._SLOT.unpack_from(self._buf, self._offset(slot))[1] == key_hash:
+                    self._write_slot(slot, 0, 0.0, b"")
+
+    def clear(self) -> None:
+        for first in range(0, self.slots, self.PROBE):
+            window = range(first, min(first + self.PROBE, self.slots))
+            with self._locked(window):
+                for slot in window:
+                    self._write_slot(slot, 0, 0.0, b"")
+
+    def close(self, unlink: bool = False) -> None:
+        """Detaches from the segment; `unlink` also removes it, for the process that owns its lifetime."""
+        self._buf = None
+        self._shm.close()
+        self._lock_file.close()
+        if unlink:
+            if sys.version_info < (3, 13):
+                # unlink() unregisters the segment, so it must be registered again first
+                resource_tracker.register(self._shm._name, "shared_memory")
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def create_cache(backend: str, max_entries: int, ttl: float, name: str = "geolocation_cache",
+                 slot_size: int = 512):
+    """Returns the cache for the configured backend: "memory" (per process) or "shared" (per host)."""
+    if backend == "shared":
+        return SharedMemoryCache(name, slots=max_entries, slot_size=slot_size, ttl=ttl)
+    if backend != "memory":
+        logger.warning("Unknown cache backend '%s'. Defaulting to memory.", backend)
+    return TTLCache(max_entries=max_entries, ttl=ttl)
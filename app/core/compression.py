@@ -0,0 +1,97 @@
+import zlib
+from typing import Dict, Optional, Sequence
+
+try:
+    import brotli
+except ImportError:  # Optional: brotli is only offered when installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: zstd is only offered when installed
+    zstandard = None
+
+
+class GzipCompressor:
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compresses a chunk; `flush` makes everything written so far decodable by the client right away."""
+        compressed = self._compressor.compress(data)
+        return compressed + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level: int = 4):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        compressed = self._compressor.process(data)
+        return compressed + self._compressor.flush() if flush else compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        compressed = self._compressor.compress(data)
+        return compressed + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Content-Encoding token -> compressor, for the encodings available in this environment
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdCompressor
+
+
+def create_compressor(encoding: str, level: Optional[int] = None):
+    compressor_class = COMPRESSORS[encoding]
+    return compressor_class() if level is None else compressor_class(level)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Parses an Accept-Encoding header into {coding: q}, e.g. "gzip, br;q=0.5" -> {"gzip": 1.0, "br": 0.5}."""
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(accept_encoding: str, preferred: Sequence[str]) -> Optional[str]:
+    """
+    Returns the available encoding the client accepts with the highest q-value, breaking ties by
+    the order of `preferred`, or None if the response should not be compressed.
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in preferred:
+        if encoding not in COMPRESSORS:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -1,4 +1,6 @@
 import logging
+from typing import Dict, List
+
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings  # ✅ Improved import!
 
@@ -12,9 +14,66 @@ class Settings(BaseSettings):
     IPSTACK_API_KEY: str  # API key for IPStack service
     BASE_URL: str  # Base URL for external API requests
     LOGGER_LEVEL: str = "INFO"  # Logging level (default: INFO)
+    LOGGER_FORMAT: str = "text"  # Log line format: "text" or "json"
+    LOGGER_SAMPLE_RATES: Dict[str, float] = {}  # Fraction of records kept per level, as JSON, e.g. {"INFO": 0.1}
     HOST: str = "127.0.0.1"  # Server host
     PORT: int = 8000  # Server port
+    WEB_CONCURRENCY: int = 0  # Production worker processes (0 = one per CPU core)
+    WORKER_MAX_REQUESTS: int = 10000  # Recycle a worker after this many requests (0 = never)
+    WORKER_MAX_REQUESTS_JITTER: int = 1000  # Random extra requests per worker, so workers don't recycle together
     DATABASE_URL: str  # Database connection URL
+    DATABASE_ECHO: bool = False  # Log every SQL statement (development only)
+    DATABASE_REPLICA_URLS: List[str] = []  # Read-replica connection URLs, as a JSON list
+    DATABASE_REPLICA_STRATEGY: str = "round_robin"  # Replica selection: "round_robin" or "least_latency"
+    DATABASE_REPLICA_HEALTH_INTERVAL: float = 5.0  # Seconds between replica health checks
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = 0  # Route a client's reads to the primary this long after its write (0 = off)
+    # Buffer new geolocations in memory and insert them in batches. Single worker only: Gunicorn refuses to start
+    # more workers with it enabled, as each worker would acknowledge duplicates its buffer can't see (see README)
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 200  # Maximum time a buffered geolocation waits before being flushed
+    WRITE_BEHIND_BATCH_SIZE: int = 500  # Flush as soon as this many geolocations are buffered
+    WRITE_BEHIND_MAX_BUFFER: int = 10000  # Buffered geolocations above which new writes wait for a flush
+    WRITE_BEHIND_ENQUEUE_TIMEOUT: float = 1.0  # Seconds a write waits for buffer space before returning HTTP 503
+    WRITE_BEHIND_SHUTDOWN_TIMEOUT: float = 10.0  # Seconds the final flush is retried on shutdown, below graceful_timeout
+    CACHE_BACKEND: str = "memory"  # Lookup cache: "memory" (per worker) or "shared" (shared memory, all workers on a host)
+    CACHE_TTL_SECONDS: float = 60  # How long a geolocation stays in the lookup cache (bounds staleness across workers)
+    CACHE_MAX_ENTRIES: int = 10000  # Cache size; for the shared backend, the number of fixed-size slots
+    CACHE_SHM_NAME: str = "geolocation_cache"  # Name of the shared memory segment
+    CACHE_SHM_SLOT_SIZE: int = 512  # Bytes per shared cache slot; larger entries are not cached
+    NEGATIVE_CACHE_MAX_ENTRIES: int = 10000  # Failed lookups remembered at most
+    NEGATIVE_CACHE_TTLS: Dict[str, float] = {  # Seconds a failed lookup is remembered, per error class (JSON)
+        "nxdomain": 300,  # Domain does not exist
+        "dns_error": 10,  # Temporary DNS failure
+        "reserved": 3600,  # Domain resolves to a private or reserved address
+        "invalid_ip": 3600,  # IPStack rejected the address
+        "rate_limit": 60,  # IPStack quota or rate limit reached (applies to all lookups)
+        "account": 60,  # IPStack access key invalid or account inactive (applies to all lookups)
+        "upstream": 15,  # Any other IPStack or network error
+    }
+    WARMUP_MAX_ROWS: int = 5000  # Hot geolocations preloaded into the cache at startup (0 = no warmup)
+    WARMUP_TIME_BUDGET: float = 10.0  # Seconds startup waits for the warmup before serving anyway
+    HOT_KEYS_FLUSH_INTERVAL: float = 30.0  # Seconds between writes of lookup counters to the database
+    HOT_KEYS_HALF_LIFE_SECONDS: float = 604800  # Lookup counters are halved this often by the sweeper (0 = never)
+    ADMIN_TOKEN: str = ""  # Token required in the X-Admin-Token header of /admin endpoints (empty = disabled)
+    SLOW_REQUEST_THRESHOLD_MS: float = 500  # Requests slower than this are recorded with a per-stage breakdown
+    SLOW_REQUEST_LOG_SIZE: int = 200  # Most recent slow requests kept
+    PROFILER_MAX_SECONDS: int = 60  # Longest profile the admin endpoint will run
+    PROFILER_INTERVAL_MS: float = 5  # Time between profiler stack samples
+    HTTP_CACHE_MAX_AGE: int = 60  # Cache-Control max-age for GET responses, in seconds (0 = always revalidate)
+    CHANGE_FEED_BUFFER_SIZE: int = 1000  # Live changes queued per subscriber before it falls back to replaying the change log
+    CHANGE_FEED_BATCH_SIZE: int = 500  # Changes read from the change log per query
+    CHANGE_FEED_KEEPALIVE_SECONDS: float = 15.0  # Idle time after which subscribers get an SSE comment
+    BULK_DELETE_BATCH_SIZE: int = 500  # Rows a bulk DELETE removes per transaction
+    BULK_DELETE_MAX_IDS: int = 1000  # Bulk DELETE responses list the deleted IDs up to this many, else only the count
+    SWEEPER_TTL_SECONDS: float = 0  # Geolocations not updated for this long are purged (0 = keep forever)
+    SWEEPER_ARCHIVE: bool = False  # Copy purged geolocations to the geolocation_archive table
+    SWEEPER_CHANGE_LOG_RETENTION_SECONDS: float = 0  # Change feed entries older than this are purged (0 = keep forever)
+    SWEEPER_INTERVAL_SECONDS: float = 300  # Seconds between sweeps
+    SWEEPER_BATCH_SIZE: int = 500  # Rows deleted per transaction
+    SWEEPER_BATCH_PAUSE_MS: float = 50  # Pause between batches, so sweeps don't compete with requests
+    COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"]  # Preferred first; br and zstd need their packages
+    COMPRESSION_MIN_SIZE: int = 1024  # Smaller responses are sent uncompressed; streamed ones are always compressed
+    COMPRESSION_LEVELS: Dict[str, int] = {"gzip": 6, "br": 4, "zstd": 3}  # Cheap levels: responses are compressed per request
 
     class Config:
         env_file = ".env"  # Load values from .env file
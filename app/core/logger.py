@@ -1,11 +1,115 @@
+import atexit
+import json
 import logging
-from app.core.config import LOG_LEVEL
+import logging.handlers
+import os
+import queue
+import random
+from contextvars import ContextVar
+from typing import Dict, Optional
 
-LOG_FORMAT = "%(asctime)s - [%(levelname)s] - %(module)s - %(message)s"
+from app.core.config import LOG_LEVEL, settings
+
+LOG_FORMAT = "%(asctime)s - [%(levelname)s] - %(module)s - [%(request_id)s] - %(message)s"
+
+# ID of the request being handled, attached to every record logged while handling it
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Attaches the current request ID to each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the records of each configured level, e.g. {"INFO": 0.1}."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = {logging.getLevelName(level.upper()): rate for level, rate in rates.items()}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Log arguments of these types can't change between the logging call and the listener formatting them
+IMMUTABLE_ARG_TYPES = (str, bytes, int, float, complex, type(None))
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them. The stock QueueHandler formats every record on the
+    calling thread so it can be pickled; our queue never leaves the process, so formatting is left
+    to the listener thread. Only records whose arguments are all immutable scalars are deferred:
+    others (e.g. a dict the caller goes on to modify) have their message formatted right away.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def _create_listener(log_queue: queue.SimpleQueue) -> logging.handlers.QueueListener:
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if settings.LOGGER_FORMAT == "json" else logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_queue_handler = DeferredQueueHandler(_queue)
+_queue_handler.addFilter(SamplingFilter(settings.LOGGER_SAMPLE_RATES))
+_queue_handler.addFilter(RequestIdFilter())
 
 logging.basicConfig(
-    format=LOG_FORMAT,
     level=LOG_LEVEL,
+    handlers=[_queue_handler],
 )
 
-logger = logging.getLogger("geolocation_app")
\ No newline at end of file
+_listener = _create_listener(_queue)
+
+
+def _restart_listener() -> None:
+    # Threads don't survive fork(), so each forked worker needs its own listener thread
+    global _listener
+    _listener = _create_listener(_queue)
+
+
+def stop_logging() -> None:
+    """Writes out queued records and stops the listener thread."""
+    _listener.stop()
+
+
+os.register_at_fork(after_in_child=_restart_listener)
+atexit.register(stop_logging)
+
+logger = logging.getLogger("geolocation_app")
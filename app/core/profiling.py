@@ -0,0 +1,127 @@
+import functools
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+
+class RequestTimings:
+    """Time spent per stage (validate, dns, db, upstream, serialize, compress) while handling one request."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+        self._active: set = set()
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+# Timings of the request being handled; None outside of requests
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Adds the time spent in the block to the current request's stage. Nested blocks of the same stage count once."""
+    timings = request_timings.get()
+    if timings is None or stage in timings._active:
+        yield
+        return
+    timings._active.add(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - started)
+        timings._active.discard(stage)
+
+
+def timed(stage: str):
+    """Decorator form of timed_stage for coroutine functions."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed_stage(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SlowRequestLog:
+    """Keeps the most recent slow requests, up to `size`."""
+
+    def __init__(self, size: int = 100):
+        self._records: deque = deque(maxlen=size)
+
+    def add(self, method: str, path: str, status: int, duration: float, request_id: Optional[str],
+            timings: RequestTimings) -> None:
+        self._records.append({
+            "time": datetime.now(timezone.utc).isoformat(),
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "request_id": request_id,
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timings.stages.items()},
+        })
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Returns recorded requests, newest first."""
+        records = list(reversed(self._records))
+        return records[:limit] if limit else records
+
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread at a fixed interval from a background thread and
+    aggregates the samples in the folded format read by flamegraph.pl and speedscope
+    ("outer;inner;innermost count" per line).
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _fold(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{frame.f_globals.get('__name__', code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._fold(frame)] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+slow_requests = SlowRequestLog(settings.SLOW_REQUEST_LOG_SIZE)
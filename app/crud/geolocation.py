@@ -1,13 +1,20 @@
-from typing import Optional, List
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, AsyncIterator, Union
 
 from fastapi import HTTPException
+from sqlalchemy import and_, delete, update, func, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.models.geolocation import GeoLocation
+from app.models.geolocation import GeoLocation, GeoLocationAccess, GeoLocationArchive, GeoLocationChange, TableVersion
 from app.schemas.geolocation import GeoLocationResponse
 from app.core.logger import logger
+from app.core.profiling import timed
+
+# PostgreSQL NOTIFY channel carrying the latest change sequence of the geolocation table
+CHANGES_CHANNEL = "geolocation_changes"
 
 
 def log_and_raise_exception(message: str, status_code: int):
@@ -16,6 +23,7 @@ def log_and_raise_exception(message: str, status_code: int):
     raise HTTPException(status_code=status_code, detail=message)
 
 
+@timed("db")
 async def get_geolocation(
     db: AsyncSession, key: str, value: str | int
 ) -> Optional[GeoLocation]:
@@ -37,6 +45,7 @@ async def get_geolocation_by_id(db: AsyncSession, id: int) -> Optional[GeoLocati
     return await get_geolocation(db, "id", id)
 
 
+@timed("db")
 async def get_all_geolocations(db: AsyncSession) -> List[GeoLocation]:
     """Retrieves all geolocation records from the database."""
     try:
@@ -46,11 +55,187 @@ async def get_all_geolocations(db: AsyncSession) -> List[GeoLocation]:
         log_and_raise_exception(f"DB error while fetching all geolocations: {e}", 500)
 
 
+async def stream_geolocations(db: AsyncSession, batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Streams all geolocations as batches of up to `batch_size` rows, ordered by ID, without loading ORM objects."""
+    columns = [getattr(GeoLocation, field) for field in GeoLocationResponse.model_fields]
+    stmt = select(*columns).order_by(GeoLocation.id).execution_options(yield_per=batch_size)
+    try:
+        result = await db.stream(stmt)
+        async for batch in result.mappings().partitions():
+            yield [dict(row) for row in batch]
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while streaming geolocations: {e}", 500)
+
+
+@timed("db")
+async def get_table_version(db: AsyncSession, table_name: str = GeoLocation.__tablename__) -> Optional[TableVersion]:
+    """Returns the change counter of a table, or None if the table was never written to."""
+    try:
+        result = await db.execute(select(TableVersion).where(TableVersion.table_name == table_name))
+        return result.scalar_one_or_none()
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while fetching table version ({table_name}): {e}", 500)
+
+
+@timed("db")
+async def bump_table_version(db: AsyncSession, table_name: str = GeoLocation.__tablename__, count: int = 1) -> int:
+    """
+    Increments the change counter of a table by `count` within the caller's transaction.
+    Returns the new counter value. The caller is responsible for committing.
+    """
+    result = await db.execute(
+        update(TableVersion)
+        .where(TableVersion.table_name == table_name)
+        .values(version=TableVersion.version + count, updated_at=func.now())
+        .returning(TableVersion.version)
+    )
+    version = result.scalar_one_or_none()
+    if version is None:
+        db.add(TableVersion(table_name=table_name, version=count))
+        version = count
+    return version
+
+
+def change_snapshot(entry: Union[GeoLocation, Dict[str, Any]]) -> Dict[str, Any]:
+    """Returns the fields of a geolocation that are published in the change feed."""
+    if isinstance(entry, GeoLocation):
+        entry = {field: getattr(entry, field) for field in GeoLocationResponse.model_fields}
+    return {field: entry.get(field) for field in GeoLocationResponse.model_fields}
+
+
+@timed("db")
+async def record_changes(db: AsyncSession, operation: str, snapshots: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    Appends changes to the change log within the caller's transaction. Each change gets the next
+    value of the table's change counter as its sequence; returns the last one.
+    On PostgreSQL subscribers in all processes are notified when the transaction commits;
+    the session's `info["change_seq"]` lets the committing process notify its own subscribers.
+    The caller is responsible for committing.
+    """
+    if not snapshots:
+        return None
+    last = await bump_table_version(db, count=len(snapshots))
+    first = last - len(snapshots) + 1
+    await db.execute(insert(GeoLocationChange).values([
+        {"seq": first + offset, "operation": operation, "geolocation_id": snapshot["id"], "data": snapshot}
+        for offset, snapshot in enumerate(snapshots)
+    ]))
+    if db.bind.dialect.name == "postgresql":
+        # NOTIFY is transactional: it is only delivered if the transaction commits
+        await db.execute(select(func.pg_notify(CHANGES_CHANNEL, str(last))))
+    db.info["change_seq"] = max(last, db.info.get("change_seq", 0))
+    return last
+
+
+@timed("db")
+async def get_changes_since(db: AsyncSession, since: int, limit: int = 500) -> List[GeoLocationChange]:
+    """Returns up to `limit` changes with a sequence above `since`, oldest first."""
+    try:
+        result = await db.execute(
+            select(GeoLocationChange)
+            .where(GeoLocationChange.seq > since)
+            .order_by(GeoLocationChange.seq)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while fetching changes since {since}: {e}", 500)
+
+
+@timed("db")
+async def get_oldest_change_seq(db: AsyncSession) -> Optional[int]:
+    """Returns the sequence of the oldest change still in the change log, or None if the log is empty."""
+    try:
+        return await db.scalar(select(func.min(GeoLocationChange.seq)))
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while fetching the oldest change: {e}", 500)
+
+
+@timed("db")
+async def record_geolocation_access(db: AsyncSession, hits: Dict[str, int]) -> None:
+    """Adds lookup counts per IP/URL to the access counters in one upsert and commits."""
+    if not hits:
+        return
+    try:
+        stmt = _dialect_insert(db, GeoLocationAccess).values(
+            [{"ip_or_url": ip_or_url, "hits": count} for ip_or_url, count in hits.items()]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GeoLocationAccess.ip_or_url],
+            set_={"hits": GeoLocationAccess.hits + stmt.excluded.hits, "last_accessed_at": func.now()},
+        )
+        await db.execute(stmt)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        log_and_raise_exception(f"DB error while recording geolocation access: {e}", 500)
+
+
+@timed("db")
+async def decay_geolocation_access(db: AsyncSession, half_life: float) -> bool:
+    """
+    Halves all lookup counters if they were last halved at least `half_life` seconds ago, deleting the
+    ones that drop to zero or whose geolocation no longer exists, and commits. The `geolocation_access`
+    table version counts the halvings and its `updated_at` is the time of the last one. Returns whether
+    the counters were halved; the first call only starts the clock.
+    """
+    table_name = GeoLocationAccess.__tablename__
+    due = datetime.now(timezone.utc) - timedelta(seconds=half_life)
+    try:
+        # Conditional, so that of several processes deciding to halve at the same time only one does
+        result = await db.execute(
+            update(TableVersion)
+            .where(TableVersion.table_name == table_name, TableVersion.updated_at <= due)
+            .values(version=TableVersion.version + 1, updated_at=func.now())
+        )
+        if not result.rowcount:
+            if await get_table_version(db, table_name) is None:
+                db.add(TableVersion(table_name=table_name, version=0))
+                await db.commit()
+            return False
+        await db.execute(update(GeoLocationAccess).values(hits=GeoLocationAccess.hits // 2))
+        await db.execute(delete(GeoLocationAccess).where(
+            (GeoLocationAccess.hits == 0) | GeoLocationAccess.ip_or_url.not_in(select(GeoLocation.ip_or_url))
+        ))
+        await db.commit()
+        return True
+    except SQLAlchemyError as e:
+        await db.rollback()
+        log_and_raise_exception(f"DB error while decaying geolocation access counters: {e}", 500)
+
+
+async def stream_hot_geolocations(db: AsyncSession, limit: int, batch_size: int = 500) -> AsyncIterator[GeoLocation]:
+    """
+    Streams up to `limit` geolocations, most frequently and then most recently looked up first,
+    followed by the most recently written ones that were never looked up.
+    """
+    stmt = (
+        select(GeoLocation)
+        .outerjoin(GeoLocationAccess, GeoLocationAccess.ip_or_url == GeoLocation.ip_or_url)
+        .order_by(
+            GeoLocationAccess.hits.desc().nulls_last(),
+            GeoLocationAccess.last_accessed_at.desc().nulls_last(),
+            GeoLocation.updated_at.desc(),
+        )
+        .limit(limit)
+        .execution_options(yield_per=batch_size)
+    )
+    try:
+        result = await db.stream(stmt)
+        async for entry in result.scalars():
+            yield entry
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while streaming hot geolocations: {e}", 500)
+
+
+@timed("db")
 async def create_geolocation(db: AsyncSession, data: GeoLocationResponse) -> GeoLocation:
     """Adds a new geolocation to the database."""
     try:
         db_entry = GeoLocation(**data.model_dump())
         db.add(db_entry)
+        await db.flush()
+        await record_changes(db, "create", [change_snapshot(db_entry)])
         await db.commit()
         await db.refresh(db_entry)
         return db_entry
@@ -58,15 +243,192 @@ async def create_geolocation(db: AsyncSession, data: GeoLocationResponse) -> Geo
         log_and_raise_exception(f"DB error while creating geolocation: {e}", 500)
 
 
-async def delete_geolocation(db: AsyncSession, id: int) -> bool:
-    """Removes a geolocation entry by its ID."""
-    entry = await get_geolocation_by_id(db, id)
-    if not entry:
-        logger.warning("Geolocation not found in DB.")
-        raise HTTPException(status_code=404, detail="Geolocation not found")
+def _dialect_insert(db: AsyncSession, model):
+    """Returns the dialect's INSERT construct, which supports ON CONFLICT on PostgreSQL and SQLite."""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return insert(model)
+
+
+def _insert_ignoring_conflicts(db: AsyncSession, rows: List[Dict[str, Any]]):
+    """Builds a multi-row INSERT that skips rows conflicting with existing ones."""
+    stmt = _dialect_insert(db, GeoLocation).values(rows)
+    if hasattr(stmt, "on_conflict_do_nothing"):
+        stmt = stmt.on_conflict_do_nothing()
+    return stmt
+
+
+@timed("db")
+async def reserve_geolocation_ids(db: AsyncSession, count: int, after: int = 0) -> List[int]:
+    """
+    Reserves `count` primary keys for rows that will be inserted later.
+    On PostgreSQL the IDs come from the table's sequence. Other databases have no sequence,
+    so IDs are handed out above the current maximum and above `after`, the last ID the
+    caller reserved; this is only safe with a single writer process.
+    """
+    try:
+        if db.bind.dialect.name == "postgresql":
+            result = await db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('geolocation', 'id')) FROM generate_series(1, :count)"),
+                {"count": count},
+            )
+            return list(result.scalars().all())
+        result = await db.execute(select(func.max(GeoLocation.id)))
+        start = max(result.scalar() or 0, after) + 1
+        return list(range(start, start + count))
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while reserving geolocation ids: {e}", 500)
+
+
+@timed("db")
+async def bulk_create_geolocations(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Inserts many geolocations in a single multi-row INSERT and commits.
+    Rows whose ID or IP/URL already exist are skipped. Returns the IDs that were inserted.
+    """
+    if not rows:
+        return []
     try:
-        await db.delete(entry)
+        columns = [getattr(GeoLocation, field) for field in GeoLocationResponse.model_fields]
+        result = await db.execute(_insert_ignoring_conflicts(db, rows).returning(*columns))
+        inserted = [change_snapshot(dict(row._mapping)) for row in result.all()]
+        await record_changes(db, "create", inserted)
         await db.commit()
+        return [snapshot["id"] for snapshot in inserted]
+    except SQLAlchemyError as e:
+        await db.rollback()
+        log_and_raise_exception(f"DB error while bulk creating geolocations: {e}", 500)
+
+
+async def _delete_returning(db: AsyncSession, condition) -> List[Dict[str, Any]]:
+    """
+    Deletes the matching geolocations in one statement, along with their lookup counters, and records
+    the deletions. Returns the deleted rows.
+    """
+    result = await db.execute(
+        delete(GeoLocation).where(condition).returning(*GeoLocation.__table__.columns),
+        execution_options={"synchronize_session": False},
+    )
+    deleted = [dict(row._mapping) for row in result.all()]
+    if deleted:
+        await db.execute(delete(GeoLocationAccess).where(
+            GeoLocationAccess.ip_or_url.in_([row["ip_or_url"] for row in deleted])
+        ))
+    await record_changes(db, "delete", [change_snapshot(row) for row in deleted])
+    return deleted
+
+
+@timed("db")
+async def delete_geolocation(db: AsyncSession, id: int) -> Dict[str, Any]:
+    """Removes a geolocation entry by its ID. Returns the deleted row."""
+    try:
+        deleted = await _delete_returning(db, GeoLocation.id == id)
+        if not deleted:
+            logger.warning("Geolocation not found in DB.")
+            raise HTTPException(status_code=404, detail="Geolocation not found")
+        await db.commit()
+        return deleted[0]
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while deleting geolocation: {e}", 500)
+
+
+@timed("db")
+async def _delete_batch(db: AsyncSession, batch, archive: bool) -> List[Dict[str, Any]]:
+    """Deletes the geolocations whose IDs `batch` selects and commits, archiving them first if asked."""
+    try:
+        deleted = await _delete_returning(db, GeoLocation.id.in_(batch.scalar_subquery()))
+        if archive and deleted:
+            await db.execute(insert(GeoLocationArchive).values(deleted))
+        await db.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        await db.rollback()
+        log_and_raise_exception(f"DB error while deleting geolocations: {e}", 500)
+
+
+async def _delete_in_batches(db: AsyncSession, condition, order_by, batch_size: int, archive: bool = False,
+                             skip_locked: bool = False) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Deletes the geolocations matching `condition` in batches of up to `batch_size` rows in `order_by` order,
+    one transaction per batch, and yields the rows deleted by each batch.
+    With `skip_locked`, rows locked by a concurrent transaction are skipped rather than waited for (PostgreSQL).
+    """
+    batch = select(GeoLocation.id).where(condition).order_by(order_by).limit(batch_size)
+    batch = batch.with_for_update(skip_locked=skip_locked)
+    while True:
+        deleted = await _delete_batch(db, batch, archive)
+        if deleted:
+            yield deleted
+        if len(deleted) < batch_size:
+            return
+
+
+async def delete_geolocations(db: AsyncSession, ids: Optional[List[int]] = None, min_id: Optional[int] = None,
+                              max_id: Optional[int] = None, country: Optional[str] = None,
+                              updated_before: Optional[datetime] = None,
+                              batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Deletes the geolocations matching all given conditions, in batches of up to `batch_size` rows each
+    committed on its own, and yields the rows deleted by each batch. At least one condition is required.
+    """
+    conditions = []
+    if ids:
+        conditions.append(GeoLocation.id.in_(ids))
+    if min_id is not None:
+        conditions.append(GeoLocation.id >= min_id)
+    if max_id is not None:
+        conditions.append(GeoLocation.id <= max_id)
+    if country is not None:
+        conditions.append(GeoLocation.country == country)
+    if updated_before is not None:
+        conditions.append(GeoLocation.updated_at < updated_before)
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Provide ids, an id range or a filter to delete by.")
+    async for deleted in _delete_in_batches(db, and_(*conditions), GeoLocation.id, batch_size):
+        yield deleted
+
+
+def purge_expired_geolocations(db: AsyncSession, before: datetime, batch_size: int,
+                               archive: bool = False) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Deletes the geolocations last updated before `before`, oldest first, in batches of up to `batch_size`
+    rows each committed on its own, copying them to the archive first if `archive` is set. Yields the rows
+    deleted by each batch. On PostgreSQL rows locked by a concurrent sweep are skipped rather than waited for.
+    """
+    return _delete_in_batches(db, GeoLocation.updated_at < before, GeoLocation.updated_at, batch_size,
+                              archive=archive, skip_locked=True)
+
+
+@timed("db")
+async def try_advisory_lock(db: AsyncSession, key: int) -> bool:
+    """
+    Takes the PostgreSQL advisory lock `key` for the rest of the caller's transaction if it is free,
+    without waiting. Returns whether it was taken. Other databases have no advisory locks: always True.
+    """
+    if db.bind.dialect.name != "postgresql":
         return True
+    try:
+        return await db.scalar(select(func.pg_try_advisory_xact_lock(key)))
+    except SQLAlchemyError as e:
+        log_and_raise_exception(f"DB error while taking advisory lock {key}: {e}", 500)
+
+
+@timed("db")
+async def purge_change_log(db: AsyncSession, before: datetime, batch_size: int) -> int:
+    """Deletes up to `batch_size` change log entries created before `before` and commits. Returns how many."""
+    batch = (
+        select(GeoLocationChange.seq)
+        .where(GeoLocationChange.created_at < before)
+        .order_by(GeoLocationChange.seq)
+        .limit(batch_size)
+    )
+    try:
+        result = await db.execute(delete(GeoLocationChange).where(GeoLocationChange.seq.in_(batch.scalar_subquery())))
+        await db.commit()
+        return result.rowcount
     except SQLAlchemyError as e:
-        log_and_raise_exception(f"DB error while deleting geolocation: {e}", 500)
\ No newline at end of file
+        await db.rollback()
+        log_and_raise_exception(f"DB error while purging the change log: {e}", 500)
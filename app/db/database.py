@@ -1,12 +1,151 @@
+import asyncio
+import itertools
+import time
+from typing import List, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.logger import logger
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, echo=settings.DATABASE_ECHO)
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
-async def get_db():
+# Cookie holding the time of the client's last write, used for read-your-writes routing
+LAST_WRITE_COOKIE = "last_write"
+
+
+class Replica:
+    """A read replica with its own engine and the results of its latest health check."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_async_engine(url, pool_pre_ping=True)
+        self.session_factory = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = True
+        self.latency: Optional[float] = None  # Smoothed health check round-trip, in seconds
+
+
+class ReplicaRouter:
+    """Selects a healthy read replica per session and health-checks replicas in the background."""
+
+    STRATEGIES = ("round_robin", "least_latency")
+
+    def __init__(self, replicas: List[Replica], strategy: str = "round_robin", health_interval: float = 5.0):
+        if strategy not in self.STRATEGIES:
+            logger.warning("Unknown replica strategy '%s'. Defaulting to round_robin.", strategy)
+            strategy = "round_robin"
+        self.replicas = replicas
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self._counter = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def choose(self) -> Optional[Replica]:
+        """Returns a healthy replica, or None if reads should go to the primary."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == "least_latency":
+            return min(healthy, key=lambda replica: replica.latency if replica.latency is not None else 0.0)
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def check_replica(self, replica: Replica) -> None:
+        """
+        Runs a trivial query against a replica and records its health and latency. A replica that takes
+        longer than `health_interval` to connect and answer is unhealthy.
+        """
+        async def ping() -> None:
+            async with replica.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        started = time.perf_counter()
+        try:
+            # Covers connecting too, as an unreachable host can hang in connect rather than in the query
+            await asyncio.wait_for(ping(), timeout=self.health_interval)
+        except Exception as e:
+            if replica.healthy:
+                logger.warning("Read replica %r is unhealthy: %s", replica.engine.url, e)
+            replica.healthy = False
+            return
+
+        latency = time.perf_counter() - started
+        replica.latency = latency if replica.latency is None else 0.8 * replica.latency + 0.2 * latency
+        if not replica.healthy:
+            logger.info("Read replica %r is healthy again", replica.engine.url)
+        replica.healthy = True
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*(self.check_replica(replica) for replica in self.replicas))
+
+    async def _run(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    async def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replica_router = ReplicaRouter(
+    [Replica(url) for url in settings.DATABASE_REPLICA_URLS],
+    strategy=settings.DATABASE_REPLICA_STRATEGY,
+    health_interval=settings.DATABASE_REPLICA_HEALTH_INTERVAL,
+)
+
+
+def wrote_recently(request: Request) -> bool:
+    """Checks whether the client wrote within the read-your-writes window."""
+    window = settings.DATABASE_READ_YOUR_WRITES_SECONDS
+    if window <= 0:
+        return False
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - last_write < window
+
+
+async def get_db(response: Response):
+    """Yields a session on the primary. Used by handlers that write."""
+    window = settings.DATABASE_READ_YOUR_WRITES_SECONDS
+    if window > 0:
+        response.set_cookie(LAST_WRITE_COOKIE, str(time.time()), max_age=int(window) + 1, httponly=True)
     async with SessionLocal() as session:
         yield session
+
+
+def read_session_factory():
+    """Returns the session factory of a healthy read replica, or of the primary if there is none."""
+    replica = replica_router.choose()
+    return replica.session_factory if replica else SessionLocal
+
+
+def get_read_session_factory(request: Request):
+    """
+    Returns the session factory get_read_db would use. For handlers that read after returning,
+    like streamed responses, whose dependency sessions are already closed by then.
+    """
+    return SessionLocal if wrote_recently(request) else read_session_factory()
+
+
+async def get_read_db(request: Request):
+    """Yields a session on a read replica, falling back to the primary."""
+    async with get_read_session_factory(request)() as session:
+        yield session
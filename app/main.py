@@ -1,30 +1,78 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 import uvicorn
+from app.api.controllers.admin import router as admin_router
 from app.api.controllers.geolocation import router
+from app.api.controllers.health import router as health_router
+from app.api.middleware import CompressionMiddleware, RequestIdMiddleware, TimingMiddleware
 from app.core.config import settings
 from app.core.logger import logger
+from app.db.database import replica_router, read_session_factory
+from app.schemas.geolocation import warm_suffix_list
+from app.services.cache import evict_changed_geolocation, warm_geolocation_cache
+from app.services.change_feed import change_feed
+from app.services.hot_keys import access_tracker
+from app.services.sweeper import expiry_sweeper
+from app.services.write_behind import write_behind_buffer
 
 
-app = FastAPI(title="Geolocation API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Runs startup tasks before the application serves requests and shutdown tasks after it stops."""
+    logger.info("Starting Geolocation API on %s:%s", settings.HOST, settings.PORT)
+    app.state.ready = False
+    await replica_router.start()
+    change_feed.add_listener(evict_changed_geolocation)  # Deletes in other workers arrive via the feed
+    await change_feed.start()
+    await write_behind_buffer.start()
+    await access_tracker.start()
+    await expiry_sweeper.start()
+    warm_suffix_list()  # Already loaded when preloaded by the production server
+    if settings.WARMUP_MAX_ROWS > 0:
+        try:
+            await asyncio.wait_for(warm_geolocation_cache(read_session_factory(), settings.WARMUP_MAX_ROWS),
+                                   timeout=settings.WARMUP_TIME_BUDGET)
+        except asyncio.TimeoutError:
+            logger.warning("Cache warmup exceeded %ss, serving with a partial cache", settings.WARMUP_TIME_BUDGET)
+        except Exception as e:
+            logger.error("Cache warmup failed, serving with a cold cache: %s", e)
+    app.state.ready = True
 
+    yield
 
-app.include_router(router)
+    logger.info("Shutting down Geolocation API")
+    app.state.ready = False
+    await expiry_sweeper.stop()
+    await write_behind_buffer.stop()  # Flush buffered writes before the engines go away
+    await access_tracker.stop()
+    await change_feed.stop()
+    await replica_router.stop()
 
-@app.on_event("startup")
-async def startup_event():
-    """Triggered when the application starts."""
-    logger.info(f"Starting Geolocation API on {settings.HOST}:{settings.PORT}")
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Triggered when the application shuts down."""
-    logger.info("Shutting down Geolocation API")
+app = FastAPI(title="Geolocation API", lifespan=lifespan)
+
+
+app.add_middleware(
+    CompressionMiddleware,
+    encodings=settings.COMPRESSION_ENCODINGS,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    levels=settings.COMPRESSION_LEVELS,
+)
+app.add_middleware(TimingMiddleware)  # Includes compression in the request's timings
+app.add_middleware(RequestIdMiddleware)  # Outermost, so the request ID is set for everything below
+
+app.include_router(router)
+app.include_router(health_router)
+app.include_router(admin_router)
 
 if __name__ == "__main__":
-    # Run the FastAPI application with Uvicorn
+    # Run the FastAPI application with Uvicorn, reloading on code changes (development only;
+    # see gunicorn.conf.py for production)
     uvicorn.run(
         app,
         host=settings.HOST,
         port=settings.PORT,
         reload=True
-    )
\ No newline at end of file
+    )
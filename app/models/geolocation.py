@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, func
 
 from sqlalchemy.orm import DeclarativeBase
 
@@ -15,10 +15,60 @@ class GeoLocation(Base):
     city = Column(String, nullable=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    version = Column(Integer, nullable=False, server_default="1")  # Row version, bumped on every ORM update
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(),
+                        index=True)
+
+    __mapper_args__ = {"version_id_col": version}
 
     def __repr__(self):
         return (
             f"GeoLocation(id={self.id}, ip_or_url={repr(self.ip_or_url)}, "
             f"country={repr(self.country)}, region={repr(self.region)}, "
             f"city={repr(self.city)}, latitude={repr(self.latitude)}, longitude={repr(self.longitude)})"
-        )
\ No newline at end of file
+        )
+
+
+class TableVersion(Base):
+    """Change counter per table, bumped in the same transaction as every write to that table."""
+    __tablename__ = "table_version"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class GeoLocationAccess(Base):
+    """Lookup counter per IP/URL, used to pick hot keys for cache warmup."""
+    __tablename__ = "geolocation_access"
+
+    ip_or_url = Column(String, primary_key=True)
+    hits = Column(Integer, nullable=False, default=0, index=True)
+    last_accessed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class GeoLocationChange(Base):
+    """Change log of the geolocation table; `seq` is the table's change counter after the change."""
+    __tablename__ = "geolocation_change"
+
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    operation = Column(String, nullable=False)  # "create" or "delete"
+    geolocation_id = Column(Integer, nullable=False)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+
+class GeoLocationArchive(Base):
+    """Geolocations removed by the expiry sweeper, kept when archiving is enabled."""
+    __tablename__ = "geolocation_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    ip_or_url = Column(String, nullable=False, index=True)
+    country = Column(String, nullable=True)
+    region = Column(String, nullable=True)
+    city = Column(String, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -3,6 +3,11 @@ from pydantic import BaseModel, Field, field_validator, IPvAnyAddress
 import tldextract
 
 
+def warm_suffix_list() -> None:
+    """Loads tldextract's public suffix list, so the first domain validation doesn't pay for it."""
+    tldextract.extract("example.com")
+
+
 class GeoRequest(BaseModel):
     """Validates an IP address or domain name."""
 
@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.cache import create_cache
+from app.core.config import settings
+from app.core.logger import logger
+from app.crud.geolocation import stream_hot_geolocations
+from app.models.geolocation import GeoLocation
+
+geolocation_cache = create_cache(
+    settings.CACHE_BACKEND,
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    ttl=settings.CACHE_TTL_SECONDS,
+    name=settings.CACHE_SHM_NAME,
+    slot_size=settings.CACHE_SHM_SLOT_SIZE,
+)
+
+
+def to_cache_entry(entry: GeoLocation) -> Dict[str, Any]:
+    """Converts a stored geolocation into a plain, JSON-compatible cache entry."""
+    return {
+        "id": entry.id,
+        "ip_or_url": entry.ip_or_url,
+        "country": entry.country,
+        "region": entry.region,
+        "city": entry.city,
+        "latitude": entry.latitude,
+        "longitude": entry.longitude,
+        "version": entry.version,
+        "updated_at": entry.updated_at.isoformat() if entry.updated_at else None,
+    }
+
+
+def cached_last_modified(cached: Dict[str, Any]) -> Optional[datetime]:
+    """Returns the Last-Modified time of a cache entry, if known."""
+    updated_at = cached.get("updated_at")
+    return datetime.fromisoformat(updated_at) if updated_at else None
+
+
+def cache_geolocation(entry: GeoLocation) -> Dict[str, Any]:
+    """Caches a stored geolocation under both its ID and its IP/URL."""
+    cached = to_cache_entry(entry)
+    geolocation_cache.set(f"id:{entry.id}", cached)
+    geolocation_cache.set(f"ip_or_url:{entry.ip_or_url}", cached)
+    return cached
+
+
+def get_cached_geolocation(id: int | None = None, ip_or_url: str | None = None) -> Optional[Dict[str, Any]]:
+    if id:
+        return geolocation_cache.get(f"id:{id}")
+    return geolocation_cache.get(f"ip_or_url:{ip_or_url}")
+
+
+def evict_geolocation(id: int, ip_or_url: str | None = None) -> None:
+    """Removes a geolocation from the cache under both of its keys."""
+    cached = geolocation_cache.get(f"id:{id}")
+    geolocation_cache.delete(f"id:{id}")
+    for key in (ip_or_url, cached["ip_or_url"] if cached else None):
+        if key:
+            geolocation_cache.delete(f"ip_or_url:{key}")
+
+
+def evict_changed_geolocation(change: Dict[str, Any]) -> None:
+    """
+    Change feed listener evicting deleted geolocations, so every worker drops them from its cache,
+    not only the one that handled the delete.
+    """
+    if change["operation"] == "delete":
+        evict_geolocation(change["data"]["id"], change["data"]["ip_or_url"])
+
+
+async def warm_geolocation_cache(session_factory, limit: int) -> int:
+    """
+    Preloads the hottest stored geolocations into the cache, streaming them from the database.
+    Returns the number of geolocations loaded; entries loaded before a timeout stay cached.
+    """
+    loaded = 0
+    async with session_factory() as db:
+        async for entry in stream_hot_geolocations(db, limit):
+            cache_geolocation(entry)
+            loaded += 1
+    logger.info("Warmed geolocation cache with %s entries", loaded)
+    return loaded
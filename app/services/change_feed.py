@@ -0,0 +1,229 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.crud.geolocation import CHANGES_CHANNEL, get_changes_since, get_oldest_change_seq, get_table_version
+from app.db.database import SessionLocal, engine
+from app.models.geolocation import GeoLocationChange
+
+
+def to_change_event(change: GeoLocationChange) -> Dict[str, Any]:
+    return {"seq": change.seq, "operation": change.operation, "data": change.data}
+
+
+class Subscription:
+    """Bounded queue of live changes for one subscriber. Once it is full, further changes are dropped."""
+
+    def __init__(self, max_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def put(self, change: Dict[str, Any]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def reset(self) -> None:
+        """Empties the queue, after which the subscriber has to catch up from the change log."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+
+class ChangeFeed:
+    """
+    Streams geolocation changes to subscribers of this process.
+
+    Committed writes signal the latest change sequence: the committing session signals its own
+    process, and on PostgreSQL every process hears it via LISTEN/NOTIFY. A background task then
+    reads the new changes once and copies them into every subscriber's bounded queue, so the
+    number of subscribers doesn't add DB load. Subscribers start by replaying the change log
+    from the sequence they asked for, and replay again whenever their queue overflowed. A
+    subscriber whose sequence is older than the pruned change log gets a reset event instead.
+    Listeners are called with every change, e.g. to invalidate this process's caches.
+    """
+
+    def __init__(self, session_factory, engine=None, buffer_size: int = 1000, batch_size: int = 500):
+        self.session_factory = session_factory
+        self.engine = engine
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.subscriptions: Set[Subscription] = set()
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.last_seq = 0  # Last change handed to the listeners and subscriptions
+        self._latest = 0  # Last change signalled
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listen_connection = None  # Connection LISTENing for changes on PostgreSQL
+
+    def signal(self, seq: int) -> None:
+        """Tells the feed that changes up to `seq` were committed."""
+        if seq > self._latest:
+            self._latest = seq
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.signal(int(payload))
+
+    async def current_seq(self) -> int:
+        """Returns the sequence of the latest committed change."""
+        async with self.session_factory() as db:
+            table_version = await get_table_version(db)
+        return table_version.version if table_version else 0
+
+    async def oldest_since(self) -> int:
+        """Returns the oldest sequence the change log can still replay from; older changes were pruned."""
+        async with self.session_factory() as db:
+            oldest = await get_oldest_change_seq(db)
+            if oldest is not None:
+                return oldest - 1
+            # Nothing is logged, so every change up to the current sequence was pruned
+            table_version = await get_table_version(db)
+        return table_version.version if table_version else 0
+
+    async def publish_pending(self) -> None:
+        """Hands the changes signalled since the last call to the listeners and subscriptions."""
+        while self.last_seq < self._latest:
+            if not self.subscriptions and not self.listeners:
+                # Subscribers replay anything they missed when they connect
+                self.last_seq = self._latest
+                return
+            async with self.session_factory() as db:
+                changes = await get_changes_since(db, self.last_seq, self.batch_size)
+            if not changes:
+                return
+            for change in changes:
+                change_event = to_change_event(change)
+                for listener in self.listeners:
+                    listener(change_event)
+                for subscription in list(self.subscriptions):
+                    subscription.put(change_event)
+            self.last_seq = changes[-1].seq
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self.publish_pending()
+            except Exception as e:
+                logger.error("Failed to publish geolocation changes after %s: %s", self.last_seq, e)
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.buffer_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    async def _replay(self, since: int) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            async with self.session_factory() as db:
+                changes = await get_changes_since(db, since, self.batch_size)
+            for change in changes:
+                yield to_change_event(change)
+                since = change.seq
+            if len(changes) < self.batch_size:
+                return
+
+    async def changes(self, since: int, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yields the changes after `since` in order, first from the change log and then live.
+        Yields None when nothing happened for `keepalive` seconds. If changes after `since` were
+        already pruned from the change log, yields a single "reset" event and stops: the subscriber
+        has to reload the full list and subscribe again from its sequence.
+        """
+        # Subscribe before replaying, so changes committed during the replay are not missed
+        subscription = self.subscribe()
+        catch_up = True
+        try:
+            while True:
+                if catch_up or subscription.overflowed:
+                    if not catch_up:
+                        logger.info("Change feed subscriber fell behind at %s, replaying from the change log", since)
+                    subscription.reset()
+                    catch_up = False
+                    oldest_since = await self.oldest_since()
+                    if since < oldest_since:
+                        logger.info("Change feed subscriber at %s is behind the pruned change log", since)
+                        yield {"seq": None, "operation": "reset", "data": {"since": since, "oldest_since": oldest_since}}
+                        return
+                    async for change in self._replay(since):
+                        yield change
+                        since = change["seq"]
+                    continue
+                try:
+                    change = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if change["seq"] > since:  # Already replayed otherwise
+                    yield change
+                    since = change["seq"]
+        finally:
+            self.unsubscribe(subscription)
+
+    async def _listen(self) -> None:
+        self._listen_connection = await self.engine.connect()
+        raw_connection = await self._listen_connection.get_raw_connection()
+        await raw_connection.driver_connection.add_listener(CHANGES_CHANNEL, self._on_notify)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        try:
+            self.last_seq = self._latest = max(self._latest, await self.current_seq())
+            if self.engine is not None and self.engine.dialect.name == "postgresql":
+                await self._listen()
+        except Exception as e:
+            logger.error("Change feed could not read the current change sequence: %s", e)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._listen_connection is not None:
+            raw_connection = await self._listen_connection.get_raw_connection()
+            await raw_connection.driver_connection.remove_listener(CHANGES_CHANNEL, self._on_notify)
+            await self._listen_connection.close()
+            self._listen_connection = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wakeup = None
+
+
+change_feed = ChangeFeed(
+    SessionLocal,
+    engine,
+    buffer_size=settings.CHANGE_FEED_BUFFER_SIZE,
+    batch_size=settings.CHANGE_FEED_BATCH_SIZE,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _signal_committed_changes(session: Session) -> None:
+    seq = session.info.pop("change_seq", None)
+    if seq:
+        change_feed.signal(seq)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_changes(session: Session, previous_transaction) -> None:
+    session.info.pop("change_seq", None)
@@ -1,10 +1,25 @@
+import ipaddress
 import socket
 from typing import Optional, Dict, Any
 
 from fastapi import HTTPException
-from app.clients.ipstack import IPStackClient
+from app.clients.ipstack import IPStackClient, negative_cache
 from app.core.logger import logger
+from app.core.profiling import timed_stage
 from app.schemas.geolocation import GeoRequest, GeoLocationSerializer
+from app.services.cache import geolocation_cache
+from app.utils import is_reserved_ip
+
+# HTTP status and detail returned for each class of failed lookup
+LOOKUP_ERRORS = {
+    "nxdomain": (400, "Domain does not exist"),
+    "dns_error": (503, "Could not resolve domain, try again later"),
+    "reserved": (400, "Private or reserved addresses have no geolocation"),
+    "invalid_ip": (400, "Invalid IP address"),
+    "rate_limit": (503, "Geolocation API rate limit reached, try again later"),
+    "account": (503, "Geolocation API access key is invalid or the account is inactive"),
+    "upstream": (502, "Geolocation API error or invalid response"),
+}
 
 
 def resolve_url_to_ip(url: str) -> Optional[str]:
@@ -15,14 +30,24 @@ def resolve_url_to_ip(url: str) -> Optional[str]:
     :return: The corresponding IP address or None if resolution fails.
     """
     try:
-        ip_address = socket.gethostbyname(url)
-        logger.info(f"Resolved URL '{url}' to IP: {ip_address}")
+        with timed_stage("dns"):
+            ip_address = socket.gethostbyname(url)
+        logger.info("Resolved URL '%s' to IP: %s", url, ip_address)
         return ip_address
-    except socket.gaierror:
-        logger.warning(f"Could not resolve URL '{url}' to an IP address")
+    except socket.gaierror as e:
+        logger.warning("Could not resolve URL '%s' to an IP address", url)
+        # Only a definite "no such name" is worth remembering for long
+        permanent = e.errno in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME))
+        negative_cache.add(url, "nxdomain" if permanent else "dns_error")
         return None
 
 
+def raise_lookup_error(error_class: str) -> None:
+    """Raises the HTTP error for a class of failed lookup."""
+    status_code, detail = LOOKUP_ERRORS.get(error_class, LOOKUP_ERRORS["upstream"])
+    raise HTTPException(status_code=status_code, detail=detail)
+
+
 def validate_geolocation_data(data: Dict[str, Any]) -> dict:
     """
     Validates geolocation data received from IPStack API.
@@ -31,10 +56,10 @@ def validate_geolocation_data(data: Dict[str, Any]) -> dict:
     :return: The validated data or raises an HTTPException if invalid.
     """
     if not data or "country_name" not in data:
-        logger.error(f"Invalid API response: {data}")
+        logger.error("Invalid API response: %s", data)
         raise HTTPException(status_code=400, detail="Invalid geolocation data received from API")
 
-    logger.info(f"Validated geolocation data for country: {data['country_name']}")
+    logger.info("Validated geolocation data for country: %s", data['country_name'])
     return data
 
 
@@ -46,7 +71,7 @@ def format_geolocation_response(ip_or_url: str, data: Dict[str, Any]) -> GeoLoca
     :param data: The raw geolocation data retrieved from the API.
     :return: A structured GeoLocationSerializer object.
     """
-    logger.info(f"Formatting response for {ip_or_url}")
+    logger.info("Formatting response for %s", ip_or_url)
     try:
         return GeoLocationSerializer(
             ip_or_url=ip_or_url,
@@ -57,7 +82,7 @@ def format_geolocation_response(ip_or_url: str, data: Dict[str, Any]) -> GeoLoca
             longitude=data.get("longitude"),
         )
     except Exception as e:
-        logger.error(f"Failed to format geolocation response: {e}")
+        logger.error("Failed to format geolocation response: %s", e)
         raise ValueError("Invalid geolocation data received.")
 
 
@@ -68,12 +93,37 @@ async def get_geolocation(request: GeoRequest) -> GeoLocationSerializer:
     :param request: The geolocation request containing an IP or URL.
     :return: A formatted GeoLocationSerializer response.
     """
-    ip_address = resolve_url_to_ip(request.ip_or_url) or request.ip_or_url
+    cache_key = f"lookup:{request.ip_or_url}"
+    cached = geolocation_cache.get(cache_key)
+    if cached:
+        logger.info("Serving cached geolocation for %s", request.ip_or_url)
+        return GeoLocationSerializer(**cached)
+
+    error_class = negative_cache.get(request.ip_or_url)
+    if error_class:
+        logger.info("Failing fast for %s after a recent '%s' failure", request.ip_or_url, error_class)
+        raise_lookup_error(error_class)
+    if is_reserved_ip(request.ip_or_url):
+        raise_lookup_error("reserved")
+
+    try:
+        # IP literals need no resolution (and gethostbyname can't handle IPv6 ones)
+        ip_address = str(ipaddress.ip_address(request.ip_or_url))
+    except ValueError:
+        ip_address = resolve_url_to_ip(request.ip_or_url)
+    if not ip_address:
+        raise_lookup_error(negative_cache.get(request.ip_or_url) or "dns_error")
+    if is_reserved_ip(ip_address):
+        negative_cache.add(request.ip_or_url, "reserved")
+        raise_lookup_error("reserved")
+
     data = await IPStackClient.fetch_geolocation(ip_address)
 
     if not data or "country_name" not in data:
-        logger.error(f"API request failed for {ip_address}: {data}")
-        raise HTTPException(status_code=502, detail="Geolocation API error or invalid response")
+        logger.error("API request failed for %s: %s", ip_address, data)
+        raise_lookup_error(IPStackClient.failure(ip_address) or "upstream")
 
-    logger.info(f"Successfully retrieved geolocation for {ip_address}")
-    return format_geolocation_response(ip_address, data)
\ No newline at end of file
+    logger.info("Successfully retrieved geolocation for %s", ip_address)
+    result = format_geolocation_response(ip_address, data)
+    geolocation_cache.set(cache_key, result.model_dump())
+    return result
\ No newline at end of file
@@ -0,0 +1,58 @@
+import asyncio
+from collections import Counter
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.crud.geolocation import record_geolocation_access
+from app.db.database import SessionLocal
+
+
+class AccessTracker:
+    """
+    Counts geolocation lookups per IP/URL in memory and periodically adds them to the
+    persisted access counters, which decide what the cache warmup preloads.
+    """
+
+    def __init__(self, session_factory, flush_interval: float = 30.0):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._hits: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, ip_or_url: str) -> None:
+        self._hits[ip_or_url] += 1
+
+    async def flush(self) -> None:
+        """Writes the counts collected since the last flush."""
+        hits, self._hits = self._hits, Counter()
+        if not hits:
+            return
+        try:
+            async with self.session_factory() as db:
+                await record_geolocation_access(db, dict(hits))
+        except Exception as e:
+            logger.error("Failed to record access counts for %s keys: %s", len(hits), e)
+            self._hits.update(hits)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+access_tracker = AccessTracker(SessionLocal, flush_interval=settings.HOT_KEYS_FLUSH_INTERVAL)
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.crud.geolocation import (
+    decay_geolocation_access,
+    purge_change_log,
+    purge_expired_geolocations,
+    try_advisory_lock,
+)
+from app.db.database import SessionLocal
+from app.services.cache import evict_geolocation
+
+# PostgreSQL advisory lock held by the one process sweeping at a time
+SWEEPER_LOCK_KEY = 0x5357454550  # "SWEEP"
+
+
+class ExpirySweeper:
+    """
+    Periodically purges geolocations not updated for `ttl` seconds, optionally archiving them, and
+    change log entries older than `change_log_retention` seconds, and halves the lookup counters
+    every `access_half_life` seconds so that cache warmup follows recent traffic.
+
+    Rows are deleted in batches of `batch_size`, each in its own short transaction, with a pause of
+    `pause` seconds between batches, so a sweep never holds locks for long or starves requests.
+    On PostgreSQL only the process holding an advisory lock sweeps; the other workers skip their turn.
+    """
+
+    def __init__(self, session_factory, ttl: float = 0, change_log_retention: float = 0, interval: float = 300,
+                 batch_size: int = 500, pause: float = 0.05, archive: bool = False, access_half_life: float = 0):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.change_log_retention = change_log_retention
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.archive = archive
+        self.access_half_life = access_half_life
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 or self.change_log_retention > 0 or self.access_half_life > 0
+
+    async def purge_geolocations(self) -> int:
+        """Purges expired geolocations and evicts them from the cache. Returns how many were purged."""
+        before = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        total = 0
+        async with self.session_factory() as db:
+            async for deleted in purge_expired_geolocations(db, before, self.batch_size, archive=self.archive):
+                for row in deleted:
+                    evict_geolocation(row["id"], row["ip_or_url"])
+                total += len(deleted)
+                await asyncio.sleep(self.pause)
+        return total
+
+    async def purge_change_log(self) -> int:
+        """Purges old change log entries. Returns how many were purged."""
+        before = datetime.now(timezone.utc) - timedelta(seconds=self.change_log_retention)
+        total = 0
+        while True:
+            async with self.session_factory() as db:
+                purged = await purge_change_log(db, before, self.batch_size)
+            total += purged
+            if purged < self.batch_size:
+                return total
+            await asyncio.sleep(self.pause)
+
+    async def sweep(self) -> int:
+        """Runs one sweep, unless another process is sweeping. Returns the number of geolocations purged."""
+        async with self.session_factory() as lock_db:
+            # The lock lasts until this session closes, i.e. for the whole sweep
+            if not await try_advisory_lock(lock_db, SWEEPER_LOCK_KEY):
+                logger.debug("Expiry sweep skipped: another process is sweeping")
+                return 0
+            purged = await self.purge_geolocations() if self.ttl > 0 else 0
+            if self.change_log_retention > 0:
+                await self.purge_change_log()
+            if self.access_half_life > 0:
+                async with self.session_factory() as db:
+                    if await decay_geolocation_access(db, self.access_half_life):
+                        logger.info("Expiry sweep halved the lookup counters")
+        if purged:
+            logger.info("Expiry sweep %s %s geolocations", "archived" if self.archive else "purged", purged)
+        return purged
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error("Expiry sweep failed: %s", e)
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+expiry_sweeper = ExpirySweeper(
+    SessionLocal,
+    ttl=settings.SWEEPER_TTL_SECONDS,
+    change_log_retention=settings.SWEEPER_CHANGE_LOG_RETENTION_SECONDS,
+    interval=settings.SWEEPER_INTERVAL_SECONDS,
+    batch_size=settings.SWEEPER_BATCH_SIZE,
+    pause=settings.SWEEPER_BATCH_PAUSE_MS / 1000,
+    archive=settings.SWEEPER_ARCHIVE,
+    access_half_life=settings.HOT_KEYS_HALF_LIFE_SECONDS,
+)
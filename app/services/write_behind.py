@@ -0,0 +1,201 @@
+import asyncio
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.crud.geolocation import bulk_create_geolocations, reserve_geolocation_ids
+from app.db.database import SessionLocal
+from app.schemas.geolocation import GeoLocationResponse, GeoLocationSerializer
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed insert may succeed unchanged on retry, i.e. the database was unreachable."""
+    if isinstance(error, HTTPException) and error.__context__ is not None:
+        error = error.__context__  # The DB error that the CRUD layer reported as an HTTP error
+    if isinstance(error, DBAPIError):
+        return isinstance(error, OperationalError) or error.connection_invalidated
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+class WriteBehindBuffer:
+    """
+    Buffers new geolocations in memory and writes them with multi-row inserts.
+
+    Buffered rows get their ID up front and are served from memory until flushed.
+    A flush happens every `flush_interval` seconds or as soon as `batch_size` rows are waiting.
+    When `max_size` rows are buffered, new writes wait up to `enqueue_timeout` seconds for space.
+    A batch that fails because the database is unreachable stays buffered for the next flush; any
+    other failure is narrowed down to the rows causing it, which are logged and dropped.
+    """
+
+    def __init__(self, session_factory, enabled: bool = False, flush_interval: float = 0.2,
+                 batch_size: int = 500, max_size: int = 10000, enqueue_timeout: float = 1.0,
+                 shutdown_timeout: float = 10.0):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.enqueue_timeout = enqueue_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self._closed = False  # Set on shutdown: new writes are refused so the final flush can drain the buffer
+        self._pending: Dict[str, Dict[str, Any]] = {}  # Rows waiting for the next flush, by IP/URL
+        self._flushing: Dict[str, Dict[str, Any]] = {}  # Rows being written right now, still served from memory
+        self._keys_by_id: Dict[int, str] = {}  # IP/URL of every pending or flushing row, by reserved ID
+        self._ids: deque = deque()
+        self._last_id = 0
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._space = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._flushing)
+
+    def get(self, ip_or_url: str) -> Optional[Dict[str, Any]]:
+        """Returns a buffered row by IP or URL."""
+        return self._pending.get(ip_or_url) or self._flushing.get(ip_or_url)
+
+    def get_by_id(self, id: int) -> Optional[Dict[str, Any]]:
+        """Returns a buffered row by its reserved ID."""
+        ip_or_url = self._keys_by_id.get(id)
+        return self.get(ip_or_url) if ip_or_url is not None else None
+
+    async def _next_id(self) -> int:
+        async with self._id_lock:
+            if not self._ids:
+                async with self.session_factory() as db:
+                    self._ids.extend(await reserve_geolocation_ids(db, self.batch_size, after=self._last_id))
+            self._last_id = self._ids.popleft()
+            return self._last_id
+
+    async def add(self, data: GeoLocationSerializer) -> GeoLocationResponse:
+        """Buffers a new geolocation and returns it with its reserved ID."""
+        if self._closed:
+            raise HTTPException(status_code=503, detail="Shutting down, retry later", headers={"Retry-After": "1"})
+        # Reserved before taking the lock, as refilling the ID pool is a DB round trip that would
+        # otherwise hold up every other write; IDs of rejected writes are skipped like rolled-back ones
+        id = await self._next_id()
+        async with self._space:
+            if self.get(data.ip_or_url):
+                raise HTTPException(status_code=409, detail="Geolocation record already exists")
+            if len(self) >= self.max_size:
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self) < self.max_size), timeout=self.enqueue_timeout
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning("Write-behind buffer is full (%s rows)", len(self))
+                    raise HTTPException(status_code=503, detail="Too many pending writes, retry later",
+                                        headers={"Retry-After": "1"})
+
+            row = {**data.model_dump(), "id": id, "version": 1}
+            self._pending[row["ip_or_url"]] = row
+            self._keys_by_id[row["id"]] = row["ip_or_url"]
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return GeoLocationResponse(**row)
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        Inserts rows and returns the inserted IDs. Transient errors are raised, so the batch is retried;
+        on other errors the batch is split in halves until the rows that can't be inserted are isolated.
+        """
+        try:
+            async with self.session_factory() as db:
+                return await bulk_create_geolocations(db, rows)
+        except Exception as e:
+            if is_transient(e):
+                raise
+            if len(rows) == 1:
+                logger.error("Write-behind dropped geolocation %s (%s) that can't be inserted: %s",
+                             rows[0]["id"], rows[0]["ip_or_url"], e)
+                return []
+            middle = len(rows) // 2
+            return await self._insert(rows[:middle]) + await self._insert(rows[middle:])
+
+    async def flush(self) -> int:
+        """Writes all buffered rows in batches. Returns the number of rows inserted."""
+        inserted = 0
+        async with self._flush_lock:
+            while self._pending:
+                keys = list(self._pending)[:self.batch_size]
+                self._flushing = {key: self._pending.pop(key) for key in keys}
+                try:
+                    ids = await self._insert(list(self._flushing.values()))
+                    if len(ids) < len(self._flushing):
+                        # Acknowledged writes lost to a row written meanwhile, or dropped by _insert
+                        stored = set(ids)
+                        skipped = [key for key, row in self._flushing.items() if row["id"] not in stored]
+                        logger.warning("Write-behind flush skipped %s rows: %s", len(skipped), skipped)
+                    for row in self._flushing.values():
+                        self._keys_by_id.pop(row["id"], None)
+                    inserted += len(ids)
+                except Exception as e:
+                    # The database is unreachable: keep the rows and retry on the next flush,
+                    # while backpressure bounds the buffer
+                    logger.error("Write-behind flush of %s rows failed: %s", len(self._flushing), e)
+                    self._pending = {**self._flushing, **self._pending}
+                    break
+                finally:
+                    self._flushing = {}
+                    async with self._space:
+                        self._space.notify_all()
+        return inserted
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._closed = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Refuses new writes, stops the periodic flush and writes out everything still buffered, retrying
+        for up to `shutdown_timeout` seconds. Rows still not written by then are logged one by one.
+        """
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if not len(self):
+            return
+        logger.info("Flushing %s buffered geolocations before shutdown", len(self))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.shutdown_timeout
+        await self.flush()
+        while len(self) and loop.time() < deadline:
+            await asyncio.sleep(min(self.flush_interval, max(deadline - loop.time(), 0)))
+            await self.flush()
+        for row in self._pending.values():
+            logger.error("Write-behind lost geolocation %s (%s) at shutdown", row["id"], row["ip_or_url"])
+
+
+write_behind_buffer = WriteBehindBuffer(
+    SessionLocal,
+    enabled=settings.WRITE_BEHIND_ENABLED,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000,
+    batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    max_size=settings.WRITE_BEHIND_MAX_BUFFER,
+    enqueue_timeout=settings.WRITE_BEHIND_ENQUEUE_TIMEOUT,
+    shutdown_timeout=settings.WRITE_BEHIND_SHUTDOWN_TIMEOUT,
+)
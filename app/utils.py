@@ -1,3 +1,4 @@
+import ipaddress
 import socket
 from app.core.logger import logger
 
@@ -6,9 +7,23 @@ def resolve_url_to_ip(ip_or_url: str) -> str:
     """Resolves a URL to an IP address, if necessary."""
     try:
         if not ip_or_url.replace('.', '').isdigit():  # Check if it's not an IP
-            logger.info(f"Resolving URL to IP: {ip_or_url}")
+            logger.info("Resolving URL to IP: %s", ip_or_url)
             return socket.gethostbyname(ip_or_url)
         return ip_or_url  # Already an IP
     except socket.gaierror:
-        logger.warning(f"Unable to resolve URL: {ip_or_url}")
+        logger.warning("Unable to resolve URL: %s", ip_or_url)
         return ""
+
+
+def is_reserved_ip(value: str) -> bool:
+    """
+    Checks whether a value is an IP address that can't have a geolocation:
+    private (RFC 1918), loopback, link-local, multicast, unspecified or otherwise reserved.
+    Returns False for anything that is not an IP address.
+    """
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return (address.is_private or address.is_loopback or address.is_link_local or address.is_multicast
+            or address.is_unspecified or address.is_reserved or not address.is_global)
@@ -0,0 +1,98 @@
+"""
+Compares the CPU cost of each response encoding and compression level against the bytes it saves,
+for a list of synthetic geolocations.
+
+    python -m benchmarks.bench_compression --rows 10000
+
+Encodings whose packages (msgpack, brotli, zstandard) are not installed are skipped.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.core.compression import COMPRESSORS, create_compressor
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 11], "zstd": [1, 3, 19]}
+
+
+def make_rows(count: int):
+    rng = random.Random(42)
+    cities = [("United States", "California", "Mountain View"), ("Poland", "Mazovia", "Warsaw"),
+              ("Germany", "Hesse", "Frankfurt am Main"), ("Japan", "Tokyo", "Tokyo")]
+    rows = []
+    for id in range(1, count + 1):
+        country, region, city = rng.choice(cities)
+        rows.append({
+            "id": id,
+            "ip_or_url": f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "country": country,
+            "region": region,
+            "city": city,
+            "latitude": round(rng.uniform(-90, 90), 4),
+            "longitude": round(rng.uniform(-180, 180), 4),
+        })
+    return rows
+
+
+def cpu_time(func, repeat: int):
+    """Returns the result of `func` and its best CPU time over `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        result = func()
+        best = min(best, time.process_time() - started)
+    return result, best * 1000
+
+
+def compress(encoding: str, level: int, body: bytes, chunk_size: int) -> bytes:
+    """Compresses `body` as the middleware does: whole, or in flushed chunks when `chunk_size` is set."""
+    compressor = create_compressor(encoding, level)
+    if not chunk_size:
+        return compressor.compress(body) + compressor.finish()
+    chunks = [compressor.compress(body[start:start + chunk_size], flush=True)
+              for start in range(0, len(body), chunk_size)]
+    return b"".join(chunks) + compressor.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="geolocations in the response")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (the fastest is reported)")
+    parser.add_argument("--bandwidth", type=float, default=100, help="link speed for the transfer estimate, Mbit/s")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    bodies = {
+        "json": lambda: json.dumps(rows).encode(),
+        "ndjson": lambda: "".join(json.dumps(row) + "\n" for row in rows).encode(),
+    }
+    if msgpack is not None:
+        bodies["msgpack"] = lambda: msgpack.packb(rows)
+
+    print(f"{args.rows} rows, transfer estimated at {args.bandwidth:g} Mbit/s\n")
+    print(f"{'format':<8} {'encoding':<14} {'bytes':>10} {'ratio':>6} {'cpu ms':>8} {'transfer ms':>12} {'total ms':>9}")
+    for name, encode in bodies.items():
+        body, encode_ms = cpu_time(encode, args.repeat)
+        variants = [("identity", None)] + [(encoding, level) for encoding in COMPRESSORS for level in LEVELS[encoding]]
+        for encoding, level in variants:
+            if level is None:
+                data, compress_ms = body, 0.0
+            else:
+                # NDJSON is streamed in flushed chunks of about one database batch
+                chunk_size = len(body) // max(args.rows // 500, 1) if name == "ndjson" else 0
+                data, compress_ms = cpu_time(lambda: compress(encoding, level, body, chunk_size), args.repeat)
+            cpu_ms = encode_ms + compress_ms
+            transfer_ms = len(data) * 8 / (args.bandwidth * 1000)
+            label = encoding if level is None else f"{encoding}:{level}"
+            print(f"{name:<8} {label:<14} {len(data):>10} {len(body) / len(data):>6.1f} {cpu_ms:>8.1f} "
+                  f"{transfer_ms:>12.1f} {cpu_ms + transfer_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Production server configuration.
+
+Runs N Uvicorn workers under Gunicorn. The app, settings and public suffix list are loaded once in the
+master process before forking, so workers share that memory copy-on-write. Uvicorn workers use uvloop
+and httptools automatically when they are installed.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+import gc
+import multiprocessing
+
+from app.core.config import settings
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+if settings.WRITE_BEHIND_ENABLED and workers > 1:
+    # Each worker's buffer only sees its own rows, so duplicate POSTs would be acknowledged by several workers
+    raise RuntimeError(f"WRITE_BEHIND_ENABLED requires a single worker, got {workers}: set WEB_CONCURRENCY=1")
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+# Recycle workers gracefully to bound memory growth
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """Runs in the master after the app is preloaded and before workers are forked."""
+    from app.schemas.geolocation import warm_suffix_list
+
+    warm_suffix_list()
+    # Move everything loaded so far out of the GC's reach, so collections in workers
+    # don't touch (and copy) the shared pages
+    gc.freeze()
+
+
+def on_exit(server):
+    """Removes the shared memory cache segment, if the shared cache backend is used."""
+    from app.services.cache import geolocation_cache
+
+    geolocation_cache.close(unlink=True)
@@ -0,0 +1,65 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import AsyncMock, patch
+
+from app.core.config import settings
+from app.core.profiling import slow_requests
+from app.main import app
+
+ADMIN_HEADERS = {"X-Admin-Token": "secret"}
+
+
+@pytest_asyncio.fixture
+async def async_client():
+    transport = ASGITransport(app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_are_hidden_without_a_token(async_client):
+    response = await async_client.get("/admin/slow-requests", headers=ADMIN_HEADERS)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_reject_a_wrong_token(async_client, admin_token):
+    response = await async_client.get("/admin/slow-requests", headers={"X-Admin-Token": "wrong"})
+
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_slow_requests_are_recorded_with_stages(mock_ipstack, async_client, admin_token, monkeypatch):
+    """Requests over the threshold should be listed with their per-stage breakdown."""
+    monkeypatch.setattr(settings, "SLOW_REQUEST_THRESHOLD_MS", 0)
+    mock_ipstack.return_value = {"country_name": "United States"}
+    await async_client.post("/geolocation", json={"ip_or_url": "8.8.8.8"})
+
+    response = await async_client.get("/admin/slow-requests", headers=ADMIN_HEADERS)
+
+    assert response.status_code == 200
+    record = next(record for record in response.json() if record["path"] == "/geolocation")
+    assert record["method"] == "POST"
+    assert record["status"] == 200
+    assert {"validate", "db", "serialize"} <= record["stages_ms"].keys()
+    slow_requests.clear()
+
+
+@pytest.mark.asyncio
+async def test_profile_returns_folded_stacks(async_client, admin_token):
+    response = await async_client.post("/admin/profile?seconds=0.05", headers=ADMIN_HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for line in response.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
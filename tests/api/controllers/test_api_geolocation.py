@@ -1,8 +1,16 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import msgpack
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 
 from app.clients.ipstack import IPStackClient
+from app.core.config import settings
+from app.crud import geolocation as crud
+from app.services.cache import geolocation_cache
+from app.services.change_feed import change_feed
 from app.main import app
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch
@@ -163,4 +171,178 @@ async def test_fetch_geolocation_server_error(mock_fetch):
     with pytest.raises(Exception) as exc_info:
         await IPStackClient.fetch_geolocation("8.8.8.8")
 
-    assert "500 Internal Server Error" in str(exc_info.value)
\ No newline at end of file
+    assert "500 Internal Server Error" in str(exc_info.value)
+
+@pytest.mark.asyncio
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_get_geolocation_not_modified(mock_ipstack, async_client):
+    """Tests that a matching If-None-Match returns 304 with the same validators."""
+    mock_ipstack.return_value = mock_ipstack_response()
+    await add_test_geolocation(async_client, ip="8.8.8.8")
+
+    response = await async_client.get("/geolocation?ip_or_url=8.8.8.8")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "last-modified" in response.headers
+    assert "max-age" in response.headers["cache-control"]
+
+    response = await async_client.get("/geolocation?ip_or_url=8.8.8.8", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+@pytest.mark.asyncio
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_get_all_geolocations_etag_changes_on_write(mock_ipstack, async_client):
+    """Tests that the collection ETag is stable until the table changes."""
+    mock_ipstack.return_value = mock_ipstack_response()
+    await add_test_geolocation(async_client, ip="8.8.8.8")
+
+    etag = (await async_client.get("/geolocation")).headers["etag"]
+    response = await async_client.get("/geolocation", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await add_test_geolocation(async_client, ip="1.1.1.1")
+
+    response = await async_client.get("/geolocation", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_bulk_delete_geolocations(mock_ipstack, async_client):
+    """Tests deleting by an ID list and by an ID range."""
+    mock_ipstack.return_value = mock_ipstack_response()
+    ids = [(await add_test_geolocation(async_client, ip=ip)).json()["id"]
+           for ip in ("8.8.8.8", "1.1.1.1", "9.9.9.9", "4.4.4.4")]
+
+    response = await async_client.delete("/geolocation", params={"id": ids[:2]})
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 2, "ids": ids[:2]}
+
+    response = await async_client.delete("/geolocation", params={"min_id": ids[2], "max_id": ids[2]})
+    assert response.json()["ids"] == [ids[2]]
+
+    remaining = (await async_client.get("/geolocation")).json()
+    assert [row["id"] for row in remaining] == [ids[3]]
+
+
+@pytest.mark.asyncio
+async def test_large_bulk_delete_runs_in_batches(setup_database, async_client):
+    """Tests that a filter delete removes every match over several batches and only counts IDs above the cap."""
+    await add_many_geolocations(setup_database, 7)
+
+    with patch.object(settings, "BULK_DELETE_BATCH_SIZE", 2), patch.object(settings, "BULK_DELETE_MAX_IDS", 3):
+        response = await async_client.delete("/geolocation", params={"max_id": 3})
+        assert response.json() == {"deleted": 3, "ids": [1, 2, 3]}
+
+        response = await async_client.delete("/geolocation", params={"country": "United States"})
+        assert response.json() == {"deleted": 4}
+
+    assert await crud.get_all_geolocations(setup_database) == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_requires_a_condition(async_client):
+    """Tests that a bulk delete without conditions is rejected instead of emptying the table."""
+    response = await async_client.delete("/geolocation")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_delete_missing_geolocation(async_client):
+    """Tests that deleting an unknown ID returns 404."""
+    response = await async_client.delete("/geolocation/999")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Geolocation not found"
+
+
+@pytest.mark.asyncio
+async def test_change_stream_from_pruned_sequence_is_gone(setup_database, session_factory, async_client):
+    """Tests that resuming the change feed after its changes were pruned returns 410 instead of skipping them."""
+    await add_many_geolocations(setup_database, 3)
+    await crud.purge_change_log(setup_database, datetime.now(timezone.utc) + timedelta(days=1), batch_size=10)
+
+    with patch.object(change_feed, "session_factory", session_factory):
+        response = await async_client.get("/geolocation/changes", params={"since": 1})
+        assert response.status_code == 410
+
+        response = await async_client.get("/geolocation/changes", headers={"Last-Event-ID": "2"})
+        assert response.status_code == 410
+
+
+async def add_many_geolocations(db, count):
+    await crud.bulk_create_geolocations(db, [{"id": id, "ip_or_url": f"10.0.0.{id}", "country": "United States"}
+                                             for id in range(1, count + 1)])
+
+
+@pytest.mark.asyncio
+async def test_large_list_is_compressed(setup_database, async_client):
+    """Tests that the list is gzipped above the size threshold and single records below it are not."""
+    await add_many_geolocations(setup_database, 50)
+
+    response = await async_client.get("/geolocation", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.headers["etag"].startswith("W/")
+    assert len(response.json()) == 50
+
+    response = await async_client.get("/geolocation", params={"id": 1}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json()["id"] == 1
+
+
+@pytest.mark.asyncio
+async def test_not_modified_matches_compressed_validators(setup_database, async_client):
+    """Tests that a 304 for a compressed list repeats the weak ETag and Vary of the compressed 200."""
+    await add_many_geolocations(setup_database, 50)
+    response = await async_client.get("/geolocation", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+
+    response = await async_client.get("/geolocation", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+@pytest.mark.asyncio
+async def test_list_as_ndjson(setup_database, async_client):
+    """Tests that the list streams as newline-delimited JSON when asked for."""
+    await add_many_geolocations(setup_database, 3)
+
+    response = await async_client.get("/geolocation", headers={"Accept": "application/x-ndjson"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [1, 2, 3]
+    assert response.headers["etag"].strip('W/"').endswith("-ndjson")
+
+
+@pytest.mark.asyncio
+async def test_msgpack_responses(setup_database, async_client):
+    """Tests that MessagePack is returned for the list and single records when asked for."""
+    await add_many_geolocations(setup_database, 2)
+    headers = {"Accept": "application/msgpack, application/json;q=0.5"}
+
+    response = await async_client.get("/geolocation", headers=headers)
+    assert response.headers["content-type"] == "application/msgpack"
+    assert [row["id"] for row in msgpack.unpackb(response.content)] == [1, 2]
+
+    response = await async_client.get("/geolocation", params={"id": 2}, headers=headers)
+    assert msgpack.unpackb(response.content)["ip_or_url"] == "10.0.0.2"
+
+
+@pytest.mark.asyncio
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_delete_evicts_cached_ip_or_url_entry(mock_ipstack, async_client):
+    """Tests that a delete evicts the IP/URL cache entry even after the ID entry aged out of the cache."""
+    mock_ipstack.return_value = mock_ipstack_response()
+    id = (await add_test_geolocation(async_client, ip="8.8.8.8")).json()["id"]
+    assert (await async_client.get("/geolocation", params={"ip_or_url": "8.8.8.8"})).status_code == 200
+    geolocation_cache.delete(f"id:{id}")
+
+    assert (await async_client.delete(f"/geolocation/{id}")).status_code == 200
+
+    assert (await async_client.get("/geolocation", params={"ip_or_url": "8.8.8.8"})).status_code == 404
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_live():
+    """The liveness probe should always succeed."""
+    with TestClient(app) as client:
+        response = client.get("/health/live")
+
+    assert response.status_code == 200
+
+
+def test_ready_after_startup():
+    """The readiness probe should succeed once the lifespan startup has completed."""
+    with TestClient(app) as client:
+        response = client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+def test_not_ready_before_startup():
+    """The readiness probe should fail while the app has not run its startup."""
+    client = TestClient(app)  # Not used as a context manager, so the lifespan does not run
+    app.state.ready = False
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == 503
+
+
+def test_request_id_is_returned():
+    """Responses should echo the caller's X-Request-ID, or carry a generated one."""
+    with TestClient(app) as client:
+        echoed = client.get("/health/live", headers={"X-Request-ID": "req-42"})
+        generated = client.get("/health/live")
+
+    assert echoed.headers["x-request-id"] == "req-42"
+    assert generated.headers["x-request-id"]
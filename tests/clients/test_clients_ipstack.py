@@ -0,0 +1,50 @@
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.clients.ipstack import IPStackClient
+
+
+def ipstack_response(payload: dict, status_code: int = 200) -> httpx.Response:
+    return httpx.Response(status_code, json=payload, request=httpx.Request("GET", "http://api.ipstack.com"))
+
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient.get", new_callable=AsyncMock)
+async def test_rate_limit_blocks_all_lookups(mock_get):
+    """After a rate-limit error, no IP is looked up until the error expires."""
+    mock_get.return_value = ipstack_response({"success": False, "error": {"code": 104, "info": "Monthly quota exceeded"}})
+
+    assert await IPStackClient.fetch_geolocation("8.8.8.8") == {}
+    assert await IPStackClient.fetch_geolocation("1.1.1.1") == {}
+
+    assert mock_get.await_count == 1
+    assert IPStackClient.failure("1.1.1.1") == "rate_limit"
+
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient.get", new_callable=AsyncMock)
+async def test_invalid_access_key_blocks_all_lookups(mock_get):
+    """An invalid access key fails every lookup, so it is remembered for all IPs like a rate limit."""
+    mock_get.return_value = ipstack_response({"success": False, "error": {"code": 101, "info": "Invalid access key"}})
+
+    assert await IPStackClient.fetch_geolocation("8.8.8.8") == {}
+    assert await IPStackClient.fetch_geolocation("1.1.1.1") == {}
+
+    assert mock_get.await_count == 1
+    assert IPStackClient.failure("1.1.1.1") == "account"
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient.get", new_callable=AsyncMock)
+async def test_upstream_error_is_remembered_per_ip(mock_get):
+    """Other errors only block lookups of the IP that failed."""
+    mock_get.side_effect = [
+        ipstack_response({}, status_code=500),
+        ipstack_response({"country_name": "Australia"}),
+    ]
+
+    assert await IPStackClient.fetch_geolocation("8.8.8.8") == {}
+    assert await IPStackClient.fetch_geolocation("8.8.8.8") == {}
+    assert await IPStackClient.fetch_geolocation("1.1.1.1") == {"country_name": "Australia"}
+
+    assert mock_get.await_count == 2
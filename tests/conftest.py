@@ -9,8 +9,10 @@ from sqlalchemy.orm import sessionmaker
 import pytest_asyncio
 
 from app.models.geolocation import Base
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db, get_read_session_factory
 from app.main import app
+from app.clients.ipstack import negative_cache
+from app.services.cache import geolocation_cache
 
 # Use an in-memory SQLite database for testing (fast & isolated)
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -29,6 +31,8 @@ async def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_read_session_factory] = lambda: TestSessionLocal
 
 
 # Setup and teardown for database tables before/after each test
@@ -43,6 +47,14 @@ async def setup_database():
     async with TestSessionLocal() as session:
         yield session  # Provide a fresh session for the test
 
-    # Drop tables after the test to prevent conflicts
+    # Drop tables and cached rows after the test to prevent conflicts
+    geolocation_cache.clear()
+    negative_cache.clear()
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    """Provides the test session factory for components that open their own sessions."""
+    return TestSessionLocal
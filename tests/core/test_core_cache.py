@@ -0,0 +1,99 @@
+import multiprocessing
+import time
+import uuid
+
+import pytest
+
+from app.core.cache import TTLCache, SharedMemoryCache
+
+
+def test_get_returns_stored_value():
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.set("key", {"value": 1})
+
+    assert cache.get("key") == {"value": 1}
+    assert cache.get("missing") is None
+
+
+def test_expired_entries_are_not_returned():
+    """Entries should disappear once their own TTL has passed."""
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.set("short", 1, ttl=0.01)
+    cache.set("long", 2)
+
+    time.sleep(0.02)
+
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    """The cache should never grow beyond max_entries, evicting the least recently used key."""
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+@pytest.fixture
+def shared_cache():
+    """Provides a shared memory cache on a segment unique to the test."""
+    cache = SharedMemoryCache(f"test_cache_{uuid.uuid4().hex[:12]}", slots=64, slot_size=256, ttl=60)
+    yield cache
+    cache.close(unlink=True)
+
+
+def test_shared_cache_get_set_delete(shared_cache):
+    shared_cache.set("key", {"country": "United States"})
+
+    assert shared_cache.get("key") == {"country": "United States"}
+    assert len(shared_cache) == 1
+
+    shared_cache.delete("key")
+
+    assert shared_cache.get("key") is None
+
+
+def test_shared_cache_skips_entries_larger_than_a_slot(shared_cache):
+    shared_cache.set("key", "x" * 1024)
+
+    assert shared_cache.get("key") is None
+
+
+def test_shared_cache_treats_corrupt_slot_as_miss(shared_cache):
+    """A slot whose payload doesn't decode is a cache miss, not an error."""
+    shared_cache.set("key", 1)
+    key_hash = shared_cache._hash("key")
+    slot = next(slot for slot in shared_cache._window(key_hash) if shared_cache._read_slot(slot)[0] == key_hash)
+    shared_cache._write_slot(slot, key_hash, time.time() + 60, b'["key", 1')
+
+    assert shared_cache.get("key") is None
+
+
+def test_shared_cache_expires_entries(shared_cache):
+    shared_cache.set("key", 1, ttl=0.01)
+
+    time.sleep(0.02)
+
+    assert shared_cache.get("key") is None
+
+
+def _set_in_child(name: str) -> None:
+    cache = SharedMemoryCache(name, slots=64, slot_size=256)
+    cache.set("ip_or_url:8.8.8.8", {"id": 1})
+    cache.close()
+
+
+def test_shared_cache_is_visible_across_processes(shared_cache):
+    """An entry written by one worker process should be a hit in another."""
+    process = multiprocessing.get_context("fork").Process(target=_set_in_child, args=(shared_cache.name,))
+    process.start()
+    process.join(timeout=10)
+
+    assert process.exitcode == 0
+    assert shared_cache.get("ip_or_url:8.8.8.8") == {"id": 1}
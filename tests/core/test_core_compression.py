@@ -0,0 +1,47 @@
+import gzip
+import zlib
+
+import pytest
+
+from app.core.compression import COMPRESSORS, choose_encoding, create_compressor, parse_accept_encoding
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, zstd;q=0") == {"gzip": 1.0, "br": 0.5, "zstd": 0.0}
+
+
+def test_choose_encoding_prefers_client_q_then_server_order():
+    """The client's q-values win; ties go to the server's preferred order; q=0 and unknown codings are skipped."""
+    assert choose_encoding("gzip;q=1, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("gzip, br", ["br", "gzip"]) == ("br" if "br" in COMPRESSORS else "gzip")
+    assert choose_encoding("gzip;q=0, deflate", ["gzip"]) is None
+    assert choose_encoding("*", ["gzip"]) == "gzip"
+    assert choose_encoding("", ["gzip"]) is None
+
+
+def test_gzip_stream_chunks_are_decodable_as_they_arrive():
+    """Every flushed chunk can be decoded on its own, so streamed rows reach the client without waiting for the end."""
+    compressor = create_compressor("gzip")
+    decoder = zlib.decompressobj(31)
+
+    assert decoder.decompress(compressor.compress(b'{"id": 1}\n', flush=True)) == b'{"id": 1}\n'
+    assert decoder.decompress(compressor.compress(b'{"id": 2}\n', flush=True)) == b'{"id": 2}\n'
+    decoder.decompress(compressor.finish())
+    assert decoder.eof
+
+
+@pytest.mark.parametrize("encoding", sorted(COMPRESSORS))
+def test_compressors_round_trip(encoding):
+    data = b'{"ip_or_url": "8.8.8.8", "country": "United States"}\n' * 100
+    compressor = create_compressor(encoding)
+    compressed = compressor.compress(data[:1000], flush=True) + compressor.compress(data[1000:]) + compressor.finish()
+
+    if encoding == "gzip":
+        assert gzip.decompress(compressed) == data
+    elif encoding == "br":
+        import brotli
+        assert brotli.decompress(compressed) == data
+    else:
+        import zstandard
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed) == data
+    assert len(compressed) < len(data)
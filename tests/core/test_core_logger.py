@@ -0,0 +1,61 @@
+import json
+import logging
+import queue
+
+from app.core.logger import (
+    DeferredQueueHandler, JsonFormatter, RequestIdFilter, SamplingFilter, request_id_var,
+)
+
+
+def make_record(level: int = logging.INFO, msg: str = "Resolved %s", args=("8.8.8.8",), **extra) -> logging.LogRecord:
+    record = logging.LogRecord("geolocation_app", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_filter_drops_sampled_levels_only():
+    sampling = SamplingFilter({"INFO": 0.0})
+
+    assert sampling.filter(make_record(logging.INFO)) is False
+    assert sampling.filter(make_record(logging.ERROR)) is True
+
+
+def test_json_formatter_includes_request_id_and_extra_fields():
+    token = request_id_var.set("abc123")
+    try:
+        record = make_record(ip="8.8.8.8")
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Resolved 8.8.8.8"
+    assert entry["request_id"] == "abc123"
+    assert entry["ip"] == "8.8.8.8"
+    assert entry["level"] == "INFO"
+
+
+def test_queue_handler_does_not_format_on_the_calling_thread():
+    """Records should be enqueued with their arguments, leaving formatting to the listener."""
+    log_queue = queue.SimpleQueue()
+    record = make_record()
+
+    DeferredQueueHandler(log_queue).handle(record)
+
+    queued = log_queue.get_nowait()
+    assert queued.msg == "Resolved %s"
+    assert queued.args == ("8.8.8.8",)
+
+
+def test_queue_handler_formats_mutable_arguments_right_away():
+    """Records with mutable arguments should be formatted before the caller can change them."""
+    log_queue = queue.SimpleQueue()
+    data = {"error": {"code": 104}}
+
+    DeferredQueueHandler(log_queue).handle(make_record(msg="Response: %s", args=(data,)))
+    data["error"]["code"] = 101
+
+    queued = log_queue.get_nowait()
+    assert queued.getMessage() == "Response: {'error': {'code': 104}}"
+    assert queued.args is None
@@ -0,0 +1,56 @@
+import threading
+import time
+from unittest.mock import patch
+
+from app.core.profiling import RequestTimings, SamplingProfiler, SlowRequestLog, request_timings, timed_stage
+
+
+def test_timed_stage_counts_nested_blocks_once():
+    timings = RequestTimings()
+    token = request_timings.set(timings)
+    try:
+        with patch.object(timings, "add", wraps=timings.add) as add:
+            with timed_stage("db"):
+                with timed_stage("db"):
+                    time.sleep(0.01)
+    finally:
+        request_timings.reset(token)
+
+    add.assert_called_once()
+    assert timings.stages["db"] >= 0.01
+
+
+def test_timed_stage_outside_a_request_is_a_no_op():
+    with timed_stage("db"):
+        pass
+
+    assert request_timings.get() is None
+
+
+def test_slow_request_log_keeps_most_recent_requests():
+    log = SlowRequestLog(size=2)
+    for path in ("/a", "/b", "/c"):
+        log.add("GET", path, 200, 1.0, None, RequestTimings())
+
+    assert [record["path"] for record in log.recent()] == ["/c", "/b"]
+
+
+def busy_wait(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profiler_samples_target_thread_in_folded_format():
+    worker = threading.Thread(target=busy_wait, args=(0.2,))
+    worker.start()
+    profiler = SamplingProfiler(worker.ident, interval=0.001)
+    profiler.start()
+    worker.join()
+    profiler.stop()
+
+    lines = profiler.folded().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.endswith("test_core_profiling:busy_wait")
+    assert int(count) > 0
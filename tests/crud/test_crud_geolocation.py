@@ -75,7 +75,8 @@ async def test_delete_geolocation_success(setup_database: AsyncSession):
     )
     await crud.create_geolocation(db, geolocation)
 
-    await crud.delete_geolocation(db, id=1)
+    deleted = await crud.delete_geolocation(db, id=1)
+    assert deleted["ip_or_url"] == "2.2.2.2"
 
     fetched = await crud.get_geolocation_by_ip_or_url(db, ip_or_url="2.2.2.2")
 
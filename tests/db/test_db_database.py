@@ -0,0 +1,95 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.db.database import Replica, ReplicaRouter, LAST_WRITE_COOKIE, wrote_recently
+
+
+def make_router(count: int, strategy: str = "round_robin") -> ReplicaRouter:
+    replicas = [Replica(f"sqlite+aiosqlite:///file:replica{i}?mode=memory&uri=true") for i in range(count)]
+    return ReplicaRouter(replicas, strategy=strategy)
+
+
+def make_request(cookie: str | None = None) -> Request:
+    headers = [(b"cookie", f"{LAST_WRITE_COOKIE}={cookie}".encode())] if cookie else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_round_robin_skips_unhealthy_replicas():
+    """Round-robin should rotate over healthy replicas only."""
+    router = make_router(3)
+    router.replicas[1].healthy = False
+
+    chosen = [router.choose() for _ in range(4)]
+
+    assert chosen == [router.replicas[0], router.replicas[2], router.replicas[0], router.replicas[2]]
+
+
+def test_least_latency_prefers_fastest_replica():
+    """Least-latency should pick the replica with the lowest measured latency."""
+    router = make_router(2, strategy="least_latency")
+    router.replicas[0].latency = 0.050
+    router.replicas[1].latency = 0.005
+
+    assert router.choose() is router.replicas[1]
+
+
+def test_no_healthy_replicas_falls_back_to_primary():
+    """When every replica is down, reads should go to the primary (None)."""
+    router = make_router(2)
+    for replica in router.replicas:
+        replica.healthy = False
+
+    assert router.choose() is None
+
+
+@pytest.mark.asyncio
+async def test_health_check_records_latency():
+    """A successful health check should mark the replica healthy and record latency."""
+    router = make_router(1)
+    replica = router.replicas[0]
+    replica.healthy = False
+
+    await router.check_health()
+
+    assert replica.healthy is True
+    assert replica.latency is not None
+    await router.stop()
+
+
+class HangingEngine:
+    """Engine whose connections never open, like one whose host silently drops packets."""
+    url = "postgresql+asyncpg://unreachable/db"
+
+    @asynccontextmanager
+    async def connect(self):
+        await asyncio.sleep(3600)
+        yield
+
+
+@pytest.mark.asyncio
+async def test_health_check_times_out_while_connecting():
+    """A replica that hangs while connecting should be marked unhealthy within the health interval."""
+    router = make_router(1)
+    router.health_interval = 0.05
+    replica = router.replicas[0]
+    engine, replica.engine = replica.engine, HangingEngine()
+
+    await asyncio.wait_for(router.check_health(), timeout=1)
+
+    assert replica.healthy is False
+    replica.engine = engine
+    await router.stop()
+
+
+def test_wrote_recently(monkeypatch):
+    """Reads should stick to the primary only inside the read-your-writes window."""
+    monkeypatch.setattr(settings, "DATABASE_READ_YOUR_WRITES_SECONDS", 5)
+
+    assert wrote_recently(make_request(str(time.time()))) is True
+    assert wrote_recently(make_request(str(time.time() - 10))) is False
+    assert wrote_recently(make_request()) is False
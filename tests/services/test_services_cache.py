@@ -0,0 +1,48 @@
+import pytest
+
+from app.crud import geolocation as crud
+from app.schemas.geolocation import GeoLocationSerializer
+from app.services.cache import geolocation_cache, get_cached_geolocation, warm_geolocation_cache
+from app.services.hot_keys import AccessTracker
+
+
+async def add_geolocations(db, *ips):
+    for ip in ips:
+        await crud.create_geolocation(db, GeoLocationSerializer(ip_or_url=ip, country="United States"))
+
+
+@pytest.mark.asyncio
+async def test_access_counts_are_persisted(setup_database, session_factory):
+    """Counted lookups should be added to the stored counters on every flush."""
+    tracker = AccessTracker(session_factory)
+    for _ in range(3):
+        tracker.record("8.8.8.8")
+    await tracker.flush()
+    tracker.record("8.8.8.8")
+    await tracker.flush()
+
+    hot = [entry async for entry in crud.stream_hot_geolocations(setup_database, limit=10)]
+    assert hot == []  # No geolocation rows yet, only counters
+
+    await add_geolocations(setup_database, "8.8.8.8")
+    hot = [entry async for entry in crud.stream_hot_geolocations(setup_database, limit=10)]
+    assert [entry.ip_or_url for entry in hot] == ["8.8.8.8"]
+
+
+@pytest.mark.asyncio
+async def test_warmup_loads_hottest_geolocations_first(setup_database, session_factory):
+    """Warmup should preload the most looked-up geolocations, up to the limit."""
+    await add_geolocations(setup_database, "1.1.1.1", "8.8.8.8", "9.9.9.9")
+    tracker = AccessTracker(session_factory)
+    for ip, hits in (("8.8.8.8", 5), ("9.9.9.9", 2)):
+        for _ in range(hits):
+            tracker.record(ip)
+    await tracker.flush()
+
+    loaded = await warm_geolocation_cache(session_factory, limit=2)
+
+    assert loaded == 2
+    assert get_cached_geolocation(ip_or_url="8.8.8.8")["country"] == "United States"
+    assert get_cached_geolocation(ip_or_url="9.9.9.9") is not None
+    assert get_cached_geolocation(ip_or_url="1.1.1.1") is None
+    assert len(geolocation_cache) == 4  # Each geolocation is cached by ID and by IP/URL
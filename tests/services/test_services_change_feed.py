@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.crud import geolocation as crud
+from app.schemas.geolocation import GeoLocationResponse
+from app.services.cache import cache_geolocation, evict_changed_geolocation, get_cached_geolocation
+from app.services.change_feed import ChangeFeed, change_feed
+
+
+def make_geolocation(id: int, ip: str) -> GeoLocationResponse:
+    return GeoLocationResponse(id=id, ip_or_url=ip, country="United States", city="Mountain View",
+                               latitude=37.386, longitude=-122.0838)
+
+
+@pytest.mark.asyncio
+async def test_writes_are_recorded_in_sequence(setup_database, session_factory):
+    """Creates and deletes get consecutive sequences, and committing signals the feed."""
+    await crud.create_geolocation(setup_database, make_geolocation(1, "8.8.8.8"))
+    await crud.bulk_create_geolocations(setup_database, [{"id": 2, "ip_or_url": "1.1.1.1"},
+                                                         {"id": 3, "ip_or_url": "9.9.9.9"}])
+    await crud.delete_geolocation(setup_database, 1)
+
+    changes = await crud.get_changes_since(setup_database, 0)
+
+    assert [(change.seq, change.operation, change.geolocation_id) for change in changes] == [
+        (1, "create", 1), (2, "create", 2), (3, "create", 3), (4, "delete", 1)]
+    assert changes[0].data["city"] == "Mountain View"
+    assert (await crud.get_table_version(setup_database)).version == 4
+    assert change_feed._latest >= 4
+
+
+@pytest.mark.asyncio
+async def test_subscriber_replays_then_receives_live_changes(setup_database, session_factory):
+    """A subscriber first gets the logged changes after its sequence, then changes as they are published."""
+    feed = ChangeFeed(session_factory)
+    await crud.create_geolocation(setup_database, make_geolocation(1, "8.8.8.8"))
+    await crud.create_geolocation(setup_database, make_geolocation(2, "1.1.1.1"))
+    changes = feed.changes(since=1, keepalive=0.01)
+
+    assert (await anext(changes))["data"]["ip_or_url"] == "1.1.1.1"
+    assert await anext(changes) is None  # Keepalive
+
+    await crud.delete_geolocation(setup_database, 1)
+    feed.signal(3)
+    await feed.publish_pending()
+
+    assert await anext(changes) == {"seq": 3, "operation": "delete", "data": make_geolocation(1, "8.8.8.8").model_dump()}
+    await changes.aclose()
+    assert not feed.subscriptions
+
+
+@pytest.mark.asyncio
+async def test_overflowed_subscriber_catches_up_from_change_log(setup_database, session_factory):
+    """Changes dropped from a full subscriber queue are replayed from the change log, without gaps."""
+    feed = ChangeFeed(session_factory, buffer_size=1)
+    changes = feed.changes(since=0, keepalive=0.01)
+    assert await anext(changes) is None
+    subscription = next(iter(feed.subscriptions))
+
+    for id, ip in enumerate(["8.8.8.8", "1.1.1.1", "9.9.9.9"], start=1):
+        await crud.create_geolocation(setup_database, make_geolocation(id, ip))
+    feed.signal(3)
+    await feed.publish_pending()
+    assert subscription.overflowed
+
+    assert [(await anext(changes))["seq"] for _ in range(3)] == [1, 2, 3]
+    assert not subscription.overflowed
+    await changes.aclose()
+
+
+@pytest.mark.asyncio
+async def test_listener_evicts_geolocations_deleted_elsewhere(setup_database, session_factory):
+    """Deletes reach the cache eviction listener through the feed, even without subscribers."""
+    feed = ChangeFeed(session_factory)
+    feed.add_listener(evict_changed_geolocation)
+    entry = await crud.create_geolocation(setup_database, make_geolocation(1, "8.8.8.8"))
+    feed.signal(1)
+    await feed.publish_pending()
+    cache_geolocation(entry)
+
+    await crud.delete_geolocation(setup_database, 1)  # As another worker would, without evicting here
+    feed.signal(2)
+    await feed.publish_pending()
+
+    assert get_cached_geolocation(id=1) is None
+    assert get_cached_geolocation(ip_or_url="8.8.8.8") is None
+
+
+@pytest.mark.asyncio
+async def test_subscriber_behind_pruned_change_log_is_reset(setup_database, session_factory):
+    """A subscriber resuming from before the oldest retained change gets a reset event instead of a gap."""
+    feed = ChangeFeed(session_factory)
+    for id, ip in enumerate(["8.8.8.8", "1.1.1.1", "9.9.9.9"], start=1):
+        await crud.create_geolocation(setup_database, make_geolocation(id, ip))
+    await crud.purge_change_log(setup_database, datetime.now(timezone.utc) + timedelta(days=1), batch_size=2)
+
+    assert await feed.oldest_since() == 2
+    changes = feed.changes(since=1, keepalive=0.01)
+    assert await anext(changes) == {"seq": None, "operation": "reset", "data": {"since": 1, "oldest_since": 2}}
+    with pytest.raises(StopAsyncIteration):
+        await anext(changes)
+
+    changes = feed.changes(since=2, keepalive=0.01)
+    assert (await anext(changes))["seq"] == 3
+    await changes.aclose()
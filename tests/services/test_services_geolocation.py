@@ -1,4 +1,7 @@
+import socket
+
 import pytest
+from fastapi import HTTPException
 from app.services.geolocation import get_geolocation, GeoRequest
 from unittest.mock import AsyncMock, patch
 
@@ -18,4 +21,57 @@ async def test_get_geolocation(mock_fetch):
 
     assert data is not None
     assert data.country == "United States"
-    assert data.city == "Mountain View"
\ No newline at end of file
+    assert data.city == "Mountain View"
+
+@pytest.mark.asyncio
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_get_geolocation_is_cached(mock_fetch):
+    mock_fetch.return_value = {"country_name": "United States", "city": "Mountain View"}
+
+    request = GeoRequest(ip_or_url="8.8.8.8")
+    first = await get_geolocation(request)
+    second = await get_geolocation(request)
+
+    assert first == second
+    assert mock_fetch.await_count == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.geolocation.socket.gethostbyname")
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_get_geolocation_ipv6_skips_dns(mock_fetch, mock_resolve):
+    """Tests that IP literals, including IPv6 ones, go to IPStack without a DNS lookup."""
+    mock_fetch.return_value = {"country_name": "United States", "region_name": "California", "city": "Mountain View"}
+
+    result = await get_geolocation(GeoRequest(ip_or_url="2001:4860:4860::8888"))
+
+    assert result.ip_or_url == "2001:4860:4860::8888"
+    mock_fetch.assert_awaited_once_with("2001:4860:4860::8888")
+    mock_resolve.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.clients.ipstack.IPStackClient.fetch_geolocation", new_callable=AsyncMock)
+async def test_get_geolocation_private_ip_skips_upstream(mock_fetch):
+    """Private and loopback addresses are rejected locally, without calling IPStack."""
+    for ip in ("192.168.1.1", "127.0.0.1", "10.0.0.8"):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_geolocation(GeoRequest(ip_or_url=ip))
+        assert exc_info.value.status_code == 400
+
+    mock_fetch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("app.services.geolocation.socket.gethostbyname")
+async def test_get_geolocation_remembers_unresolvable_domain(mock_resolve):
+    """A domain that does not exist is answered from the negative cache on the next request."""
+    mock_resolve.side_effect = socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    request = GeoRequest(ip_or_url="does-not-exist.example.com")
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_geolocation(request)
+        assert exc_info.value.status_code == 400
+
+    assert mock_resolve.call_count == 1
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select, update
+
+from app.crud import geolocation as crud
+from app.models.geolocation import GeoLocation, GeoLocationAccess, GeoLocationArchive, GeoLocationChange, TableVersion
+from app.schemas.geolocation import GeoLocationResponse
+from app.services.cache import cache_geolocation, get_cached_geolocation
+from app.services.sweeper import ExpirySweeper
+
+
+async def add_geolocations(db, count: int, age: timedelta = timedelta()):
+    rows = [{"id": id, "ip_or_url": f"10.0.0.{id}"} for id in range(1, count + 1)]
+    await crud.bulk_create_geolocations(db, rows)
+    await db.execute(update(GeoLocation).values(updated_at=datetime.now(timezone.utc) - age),
+                     execution_options={"synchronize_session": False})
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_sweep_archives_expired_geolocations_in_batches(setup_database, session_factory):
+    """Expired rows are moved to the archive batch by batch, evicted from the cache and logged as deletions."""
+    await add_geolocations(setup_database, 5, age=timedelta(hours=2))
+    await crud.create_geolocation(setup_database, GeoLocationResponse(id=6, ip_or_url="8.8.8.8"))
+    cache_geolocation(await crud.get_geolocation_by_id(setup_database, 1))
+    sweeper = ExpirySweeper(session_factory, ttl=3600, batch_size=2, pause=0, archive=True)
+
+    assert await sweeper.sweep() == 5
+
+    remaining = (await setup_database.execute(select(GeoLocation.id))).scalars().all()
+    archived = (await setup_database.execute(select(GeoLocationArchive.id))).scalars().all()
+    assert remaining == [6]
+    assert sorted(archived) == [1, 2, 3, 4, 5]
+    assert get_cached_geolocation(id=1) is None
+    changes = await crud.get_changes_since(setup_database, 6)
+    assert [change.operation for change in changes] == ["delete"] * 5
+
+
+@pytest.mark.asyncio
+async def test_sweep_purges_old_change_log_entries(setup_database, session_factory):
+    """Change log entries past the retention are purged; recent ones are kept."""
+    await add_geolocations(setup_database, 3)
+    await setup_database.execute(update(GeoLocationChange).where(GeoLocationChange.seq < 3)
+                                 .values(created_at=datetime.now(timezone.utc) - timedelta(days=2)))
+    await setup_database.commit()
+    sweeper = ExpirySweeper(session_factory, change_log_retention=86400, batch_size=1, pause=0)
+
+    assert await sweeper.purge_change_log() == 2
+    assert [change.seq for change in await crud.get_changes_since(setup_database, 0)] == [3]
+
+
+@pytest.mark.asyncio
+async def test_sweep_is_skipped_while_another_process_sweeps(setup_database, session_factory):
+    """Only the process holding the sweeper lock purges; the others skip the sweep."""
+    await add_geolocations(setup_database, 2, age=timedelta(hours=2))
+    sweeper = ExpirySweeper(session_factory, ttl=3600, pause=0)
+
+    with patch("app.services.sweeper.try_advisory_lock", AsyncMock(return_value=False)):
+        assert await sweeper.sweep() == 0
+    assert len((await setup_database.execute(select(GeoLocation.id))).scalars().all()) == 2
+
+    assert await sweeper.sweep() == 2
+
+
+@pytest.mark.asyncio
+async def test_sweep_halves_lookup_counters(setup_database, session_factory):
+    """Lookup counters are halved once per half-life; zero counters and those of deleted records are dropped."""
+    await add_geolocations(setup_database, 3)
+    await crud.record_geolocation_access(setup_database, {"10.0.0.1": 5, "10.0.0.2": 1, "10.0.0.3": 4})
+    await crud.delete_geolocation(setup_database, 3)
+    sweeper = ExpirySweeper(session_factory, access_half_life=3600, pause=0)
+
+    await sweeper.sweep()  # Starts the clock
+    await sweeper.sweep()  # Not due yet
+    hits = dict((await setup_database.execute(select(GeoLocationAccess.ip_or_url, GeoLocationAccess.hits))).all())
+    assert hits == {"10.0.0.1": 5, "10.0.0.2": 1}
+
+    await setup_database.execute(update(TableVersion).where(TableVersion.table_name == "geolocation_access")
+                                 .values(updated_at=datetime.now(timezone.utc) - timedelta(hours=2)))
+    await setup_database.commit()
+    await sweeper.sweep()
+
+    hits = dict((await setup_database.execute(select(GeoLocationAccess.ip_or_url, GeoLocationAccess.hits))).all())
+    assert hits == {"10.0.0.1": 2}
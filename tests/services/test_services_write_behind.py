@@ -0,0 +1,121 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+from app.crud import geolocation as crud
+from app.schemas.geolocation import GeoLocationSerializer
+from app.services.write_behind import WriteBehindBuffer
+
+
+def make_geolocation(ip: str) -> GeoLocationSerializer:
+    return GeoLocationSerializer(ip_or_url=ip, country="United States", city="Mountain View",
+                                 latitude=37.386, longitude=-122.0838)
+
+
+@pytest.mark.asyncio
+async def test_buffered_geolocation_is_served_before_flush(setup_database, session_factory):
+    """Buffered rows get an ID immediately and reach the database with that ID on flush."""
+    buffer = WriteBehindBuffer(session_factory, enabled=True, batch_size=10)
+
+    created = await buffer.add(make_geolocation("8.8.8.8"))
+
+    assert buffer.get("8.8.8.8")["id"] == created.id
+    assert buffer.get_by_id(created.id)["ip_or_url"] == "8.8.8.8"
+    assert await crud.get_geolocation_by_ip_or_url(setup_database, "8.8.8.8") is None
+
+    assert await buffer.flush() == 1
+
+    stored = await crud.get_geolocation_by_ip_or_url(setup_database, "8.8.8.8")
+    assert stored.id == created.id
+    assert buffer.get("8.8.8.8") is None
+    assert buffer.get_by_id(created.id) is None
+
+
+@pytest.mark.asyncio
+async def test_flush_skips_rows_written_elsewhere(setup_database, session_factory):
+    """A buffered row whose IP/URL was stored meanwhile (e.g. by another worker) is dropped at flush."""
+    buffer = WriteBehindBuffer(session_factory, enabled=True, batch_size=10)
+    created = await buffer.add(make_geolocation("8.8.8.8"))
+    await crud.bulk_create_geolocations(setup_database, [{"id": created.id + 100, "ip_or_url": "8.8.8.8"}])
+
+    assert await buffer.flush() == 0
+
+    assert buffer.get_by_id(created.id) is None
+    assert (await crud.get_geolocation_by_ip_or_url(setup_database, "8.8.8.8")).id == created.id + 100
+
+
+@pytest.mark.asyncio
+async def test_flush_drops_rows_that_always_fail(setup_database, session_factory):
+    """A row that can never be inserted is isolated and dropped instead of blocking the rest of the buffer."""
+    buffer = WriteBehindBuffer(session_factory, enabled=True, batch_size=10)
+    for ip in ("8.8.8.8", "1.1.1.1", "9.9.9.9", "4.4.4.4"):
+        await buffer.add(make_geolocation(ip))
+    bad = buffer.get("1.1.1.1")
+    bad["ip_or_url"] = None  # Violates NOT NULL on every attempt
+
+    assert await buffer.flush() == 3
+
+    assert len(buffer) == 0
+    assert buffer.get_by_id(bad["id"]) is None
+    stored = await crud.get_all_geolocations(setup_database)
+    assert sorted(row.ip_or_url for row in stored) == ["4.4.4.4", "8.8.8.8", "9.9.9.9"]
+
+
+@pytest.mark.asyncio
+async def test_flush_keeps_rows_while_database_is_unreachable(setup_database, session_factory):
+    """Rows stay buffered when the database can't be reached, and are written once it is back."""
+    buffer = WriteBehindBuffer(session_factory, enabled=True, batch_size=10)
+    await buffer.add(make_geolocation("8.8.8.8"))
+    unreachable = OperationalError("INSERT", {}, ConnectionRefusedError("connection refused"))
+
+    with patch("app.services.write_behind.bulk_create_geolocations", AsyncMock(side_effect=unreachable)):
+        assert await buffer.flush() == 0
+    assert buffer.get("8.8.8.8") is not None
+
+    assert await buffer.flush() == 1
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_applies_backpressure(session_factory):
+    """Writes beyond the buffer limit fail with 503 once the enqueue timeout passes."""
+    buffer = WriteBehindBuffer(session_factory, enabled=True, max_size=1, enqueue_timeout=0.01)
+    await buffer.add(make_geolocation("8.8.8.8"))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await buffer.add(make_geolocation("1.1.1.1"))
+
+    assert exc_info.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_rows(setup_database, session_factory):
+    """Stopping the buffer writes out everything still pending."""
+    buffer = WriteBehindBuffer(session_factory, enabled=True, flush_interval=60)
+    await buffer.start()
+    await buffer.add(make_geolocation("8.8.8.8"))
+    await buffer.add(make_geolocation("1.1.1.1"))
+
+    await buffer.stop()
+
+    assert len(await crud.get_all_geolocations(setup_database)) == 2
+    assert len(buffer) == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_refuses_writes_and_retries_final_flush(setup_database, session_factory):
+    """Once stopping, new writes get 503, and the final flush is retried until the database is back."""
+    buffer = WriteBehindBuffer(session_factory, enabled=True, flush_interval=0.01, shutdown_timeout=1)
+    await buffer.add(make_geolocation("8.8.8.8"))
+    unreachable = OperationalError("INSERT", {}, ConnectionRefusedError("connection refused"))
+    insert = AsyncMock(side_effect=[unreachable, unreachable, [1]])
+
+    with patch("app.services.write_behind.bulk_create_geolocations", insert):
+        await buffer.stop()
+
+    assert insert.await_count == 3
+    assert len(buffer) == 0
+    with pytest.raises(HTTPException) as exc_info:
+        await buffer.add(make_geolocation("1.1.1.1"))
+    assert exc_info.value.status_code == 503